@@ -2,8 +2,6 @@ import sys
 import os
 from src.environment import Bloodstream
 from src.visualization import Visualization
-from src.data_generator import generate_dataset
-from src.model import train_model
 
 def main():
     print("AI Diagnostics & Nano-Bot Cellular Repair Simulation")
@@ -12,23 +10,28 @@ def main():
     # Check for data
     if not os.path.exists("data/train"):
         print("Dataset not found. Generating...")
+        from src.data_generator import generate_dataset
         generate_dataset()
         
     # Check for model
+    diagnosis = None # Config default
     if not os.path.exists("models/cell_classifier.pkl"):
         print("Model not found. Training...")
         try:
+            # Imported here so startup doesn't pay for sklearn unless we train
+            from src.model import train_model
             train_model()
         except Exception as e:
             print(f"Training failed: {e}")
-            print("Running in simulation-only mode (randomized classification).")
+            print("Running in simulation-only mode (no classifier).")
+            diagnosis = False
 
     print("\nStarting Simulation...")
     print("Model: Bloodstream (Mesa)")
     print("Viz: Matplotlib Animation")
     
     # Initialize Model
-    model = Bloodstream()
+    model = Bloodstream() if diagnosis is None else Bloodstream(diagnosis=diagnosis)
     
     # Initialize Visualization
     viz = Visualization(model)
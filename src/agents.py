@@ -10,11 +10,26 @@ class Cell(Agent):
         super().__init__(model)
         self.unique_id = unique_id
         self.pos = pos # (x, y, z)
-        self.image = None # Placeholder for visualizer
+        self.image = None # Set by DiagnosisEngine in diagnosis mode
+        self.image_key = None
+        self.diagnosis = None # Classifier P(cancer) once scanned
         self.is_cancer = is_cancer
         self.damage_level = 0.0
         self.being_repaired = False
         self.just_neutralized = False
+        self.neutralized_at = None # model.steps when neutralized; despawned NEUTRALIZED_TTL later
+
+    def is_target(self, engine=None):
+        """
+        Whether bots should go after this cell. Without a diagnosis engine
+        that is the ground truth; with one, every untreated cell is a
+        candidate until the classifier clears it, so the verdict alone decides.
+        """
+        if self.damage_level >= 1.0:
+            return False
+        if engine is None:
+            return self.is_cancer
+        return not engine.is_cleared(self)
 
     def step(self):
         pass
@@ -55,7 +70,9 @@ class NanoBot(Agent):
 
         if self.state == "IDLE":
             self.random_movement()
-            self.scan_for_targets()
+            # With a central allocator, targets are handed out once per tick instead
+            if self.model.allocator is None:
+                self.scan_for_targets()
         
         elif self.state == "TARGETING":
             if self.target_cell and self.target_cell.damage_level < 1.0:
@@ -70,8 +87,16 @@ class NanoBot(Agent):
         elif self.state == "SCANNING":
             self.scan_timer -= 1
             if self.scan_timer <= 0:
-                self.state = "ACTING"
-                self.broadcast_target(self.target_cell)
+                verdict = self.diagnose(self.target_cell)
+                if verdict is True:
+                    self.state = "ACTING"
+                    if self.model.allocator is None:
+                        self.broadcast_target(self.target_cell)
+                elif verdict is False:
+                    # Classifier says healthy: leave it alone
+                    self.state = "IDLE"
+                    self.target_cell = None
+                # None: queued for this tick's batched inference, keep scanning
 
         elif self.state == "ACTING":
             self.perform_action()
@@ -91,6 +116,19 @@ class NanoBot(Agent):
         if self.battery < 30 and self.state != "RECHARGING":
             self.seek_energy()
 
+    def diagnose(self, cell):
+        """
+        True/False once the target is confirmed cancerous/healthy, None while the
+        diagnosis engine has it queued. Without an engine every scan confirms.
+        """
+        engine = self.model.diagnosis
+        if engine is None:
+            return True
+        p_cancer = engine.lookup(cell)
+        if p_cancer is None:
+            return None
+        return p_cancer >= engine.threshold
+
     def broadcast_target(self, target):
         # Brute force neighbor check in 3D
         radius = 15
@@ -119,8 +157,9 @@ class NanoBot(Agent):
         # Scan local 3D area
         radius = 10
         candidates = []
+        engine = self.model.diagnosis
         for n in self.model.agents_list:
-            if isinstance(n, Cell) and n.is_cancer and n.damage_level < 1.0:
+            if isinstance(n, Cell) and n.is_target(engine):
                  if self.get_distance(self.pos, n.pos) <= radius:
                      candidates.append(n)
         
@@ -133,6 +172,12 @@ class NanoBot(Agent):
         x, y, z = self.pos
         tx, ty, tz = target_pos
         
+        # Within one step: land exactly on the target (positions may be
+        # fractional once the flow field moves agents)
+        if abs(tx - x) <= 1 and abs(ty - y) <= 1 and abs(tz - z) <= 1:
+            self.pos = (tx, ty, tz)
+            return
+        
         dx = 1 if tx > x else (-1 if tx < x else 0)
         dy = 1 if ty > y else (-1 if ty < y else 0)
         dz = 1 if tz > z else (-1 if tz < z else 0)
@@ -141,24 +186,27 @@ class NanoBot(Agent):
         self.pos = (x + dx, y + dy, z + dz)
 
     def seek_energy(self):
-        # Find nearest RechargeStation
-        stations = [a for a in self.model.agents_list if isinstance(a, RechargeStation)]
-        if stations:
-            closest = min(stations, key=lambda s: self.get_distance(self.pos, s.pos))
+        # Nearest RechargeStation and the step towards it from the model's precomputed lookup field
+        station, (dx, dy, dz) = self.model.station_field.next_step(self.pos)
+        if station is not None:
             self.state = "LOW_BATTERY"
-            self.move_towards(closest.pos)
+            x, y, z = self.pos
+            self.pos = (x + dx, y + dy, z + dz)
 
     def perform_action(self):
         if not self.target_cell:
             self.state = "IDLE"
             return
 
-        if self.target_cell.is_cancer:
+        # In diagnosis mode ACTING means the classifier flagged the cell, so it
+        # is treated whatever the ground truth says
+        if self.target_cell.is_cancer or self.model.diagnosis is not None:
             self.target_cell.being_repaired = True
             self.target_cell.damage_level += 0.2
             if self.target_cell.damage_level >= 1.0:
                 self.target_cell.is_cancer = False # Neutralized
                 self.target_cell.just_neutralized = True
+                self.target_cell.neutralized_at = self.model.steps
                 self.target_cell.being_repaired = False
                 self.state = "IDLE"
                 self.target_cell = None
@@ -182,10 +230,11 @@ class RechargeStation(Agent):
 
     def step(self):
         # Refill bots in same position or neighbors
-        # For simplicity in continuous space/sparse grid, check distance
+        # For simplicity in continuous space/sparse grid, check distance.
+        # Only bots routed to this station are candidates (see Bloodstream.charge_queue)
         radius = 5
-        for agent in self.model.agents_list:
-            if isinstance(agent, NanoBot) and agent.battery < 100:
+        for agent in self.model.charge_queue(self):
+            if agent.battery < 100:
                  if self.get_distance(self.pos, agent.pos) <= radius:
                      agent.battery = min(100, agent.battery + 10) # Charge rate
                      agent.state = "RECHARGING"
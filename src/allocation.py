@@ -0,0 +1,114 @@
+import numpy as np
+from src.agents import Cell, NanoBot
+
+# Centralized per-tick target assignment (TARGETING_POLICY = "greedy" or
+# "hungarian"), an alternative to each idle bot scanning on its own and
+# ACTING bots broadcasting their target to every idle neighbour.
+
+BUSY_STATES = ("TARGETING", "SCANNING", "ACTING")
+
+def greedy_match(cost, capacity):
+    """
+    Assigns rows (bots) to columns (cells) in vectorized rounds: every
+    unassigned bot bids for its cheapest cell that still has capacity, and
+    each cell accepts its cheapest bids up to capacity. Returns the column
+    per row (-1 = unassigned). Infinite costs are never assigned.
+    """
+    n_bots, n_cells = cost.shape
+    assignment = np.full(n_bots, -1, dtype=np.int64)
+    capacity = capacity.astype(np.int64).copy()
+    free = np.arange(n_bots)
+    while len(free) and capacity.any():
+        bids = np.where(capacity > 0, cost[free], np.inf)
+        choice = bids.argmin(axis=1)
+        price = bids[np.arange(len(free)), choice]
+        reachable = np.isfinite(price)
+        free, choice, price = free[reachable], choice[reachable], price[reachable]
+        if not len(free):
+            break
+
+        # Rank bids within each cell by cost; accept the first capacity[cell]
+        order = np.lexsort((price, choice))
+        free, choice = free[order], choice[order]
+        first = np.searchsorted(choice, choice)
+        accepted = (np.arange(len(choice)) - first) < capacity[choice]
+
+        assignment[free[accepted]] = choice[accepted]
+        capacity -= np.bincount(choice[accepted], minlength=n_cells)
+        free = free[~accepted]
+    return assignment
+
+def hungarian_match(cost, capacity):
+    """Minimum total cost assignment with each cell repeated capacity times (needs scipy)."""
+    from scipy.optimize import linear_sum_assignment
+
+    columns = np.repeat(np.arange(cost.shape[1]), capacity)
+    assignment = np.full(cost.shape[0], -1, dtype=np.int64)
+    if not len(columns):
+        return assignment
+    expanded = cost[:, columns]
+    finite = np.isfinite(expanded)
+    big = expanded[finite].max() * 10 + 1 if finite.any() else 1.0
+    rows, cols = linear_sum_assignment(np.where(finite, expanded, big))
+    ok = finite[rows, cols]
+    assignment[rows[ok]] = columns[cols[ok]]
+    return assignment
+
+MATCHERS = {"greedy": greedy_match, "hungarian": hungarian_match}
+
+class TargetAllocator:
+    """
+    Once per tick, matches every IDLE bot to a cell that needs a bot
+    (Cell.is_target: untreated cancer, or in diagnosis mode any cell the
+    classifier hasn't cleared) using a vectorized distance matrix, allowing
+    at most max_per_cell bots (counting those already on their way) per
+    cell. radius (None = unlimited) bounds how far a bot may be sent.
+    """
+    def __init__(self, method="greedy", max_per_cell=2, radius=None):
+        if method == "hungarian":
+            # Optional dependency: fail at startup rather than on the first tick
+            try:
+                import scipy.optimize # noqa: F401
+            except ImportError:
+                raise ImportError('Targeting policy "hungarian" needs scipy (pip install scipy)') from None
+        self.match = MATCHERS[method]
+        self.method = method
+        self.max_per_cell = max_per_cell
+        self.radius = radius
+        self.last_assigned = 0
+
+    def assign(self, model):
+        engine = model.diagnosis
+        cells, bots = [], []
+        for a in model.agents_list:
+            if isinstance(a, Cell):
+                if a.is_target(engine):
+                    cells.append(a)
+            elif isinstance(a, NanoBot) and a.state == "IDLE" and not a.manual_override and a.battery > 0:
+                bots.append(a)
+        self.last_assigned = 0
+        if not cells or not bots:
+            return 0
+
+        # Bots already working a cell count against its cap
+        column = {c: i for i, c in enumerate(cells)}
+        load = np.zeros(len(cells), dtype=np.int64)
+        for a in model.agents_list:
+            if isinstance(a, NanoBot) and a.state in BUSY_STATES and a.target_cell is not None:
+                i = column.get(a.target_cell)
+                if i is not None:
+                    load[i] += 1
+        capacity = np.maximum(self.max_per_cell - load, 0)
+
+        bot_pos = np.array([b.pos for b in bots], dtype=float)
+        cell_pos = np.array([c.pos for c in cells], dtype=float)
+        cost = np.sqrt(((bot_pos[:, None, :] - cell_pos[None, :, :]) ** 2).sum(axis=2))
+        if self.radius is not None:
+            cost[cost > self.radius] = np.inf
+
+        for bot, col in zip(bots, self.match(cost, capacity)):
+            if col >= 0:
+                bot.target_cell = cells[col]
+                bot.state = "TARGETING"
+                self.last_assigned += 1
+        return self.last_assigned
@@ -0,0 +1,334 @@
+import os
+import pickle
+import subprocess
+import sys
+import time
+import numpy as np
+
+# Offline benchmarks. Run with: python -m src.benchmarks <name>
+
+def _latency(fn, repeats):
+    """Median wall time of fn() in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def benchmark_features(pipelines=("raw", "gray", "compact"), n_estimators=100):
+    """
+    Compares feature pipelines on accuracy, pickled model size and
+    single-image / batch predict latency.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+    from src.features import build_pipeline
+    from src.model import load_data
+
+    X, y = load_data()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    results = []
+    for name in pipelines:
+        features = build_pipeline(name)
+
+        start = time.perf_counter()
+        F_train = features.fit_transform(X_train)
+        clf = RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=42)
+        clf.fit(F_train, y_train)
+        train_s = time.perf_counter() - start
+
+        acc = accuracy_score(y_test, clf.predict(features.transform(X_test)))
+        size = len(pickle.dumps({"model": clf, "features": features}))
+
+        single = _latency(lambda: clf.predict_proba(features.transform(X_test[:1])), repeats=20)
+        batch = _latency(lambda: clf.predict_proba(features.transform(X_test)), repeats=3)
+
+        results.append({
+            "pipeline": name,
+            "dims": F_train.shape[1],
+            "accuracy": acc,
+            "train_s": train_s,
+            "size_mb": size / 1e6,
+            "single_ms": single * 1000,
+            "batch_ms_per_img": batch * 1000 / len(X_test),
+        })
+
+    print(f"{'pipeline':<10}{'dims':>8}{'acc':>8}{'train s':>10}{'size MB':>10}{'1-img ms':>10}{'batch ms/img':>14}")
+    for r in results:
+        print(f"{r['pipeline']:<10}{r['dims']:>8}{r['accuracy']:>8.3f}{r['train_s']:>10.2f}"
+              f"{r['size_mb']:>10.2f}{r['single_ms']:>10.2f}{r['batch_ms_per_img']:>14.3f}")
+    return results
+
+def _timed_subprocess(code):
+    """Runs code in a fresh interpreter; code must print a single elapsed time."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def benchmark_startup(repeats=5):
+    """Cold-start cost of the CLI, the server module and the first prediction."""
+    timer = "import time; t = time.perf_counter(); {}; print(time.perf_counter() - t)"
+    cases = {
+        "cli import (main)": timer.format("import main"),
+        "server import": timer.format("import src.web.server"),
+        "classifier first predict (mmap)": timer.format(
+            "import numpy as np; from src.model import CellClassifier; "
+            "CellClassifier(mmap_mode='r').predict(np.zeros((128, 128, 3), np.uint8))"),
+        "classifier first predict (in-RAM)": timer.format(
+            "import numpy as np; from src.model import CellClassifier; "
+            "CellClassifier(mmap_mode=None).predict(np.zeros((128, 128, 3), np.uint8))"),
+    }
+    results = {}
+    for name, code in cases.items():
+        times = [_timed_subprocess(code) for _ in range(repeats)]
+        results[name] = float(np.median(times))
+        print(f"{name:<36}{results[name] * 1000:>10.1f} ms")
+    return results
+
+def benchmark_synthetic(total=20000, batch_size=1000):
+    """Synthetic images/s: one-at-a-time generator vs batched process-pool stream."""
+    from src.data_generator import create_cell_image, stream_synthetic
+
+    n_serial = min(total, 2000)
+    start = time.perf_counter()
+    for i in range(n_serial):
+        create_cell_image(i % 2 == 0)
+    serial = n_serial / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    n = sum(len(images) for images, _ in stream_synthetic(total, batch_size=batch_size))
+    parallel = n / (time.perf_counter() - start)
+
+    print(f"serial   {serial:>10.0f} img/s")
+    print(f"stream   {parallel:>10.0f} img/s ({os.cpu_count()} CPUs)")
+    return {"serial": serial, "stream": parallel}
+
+def benchmark_forest(n_estimators=100, repeats=50):
+    """
+    sklearn predict_proba vs CompiledForest on the real dataset: parity plus
+    single-sample and full-batch latency.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from src.features import build_pipeline
+    from src.forest import CompiledForest
+    from src.model import load_data
+
+    X, y = load_data()
+    F = build_pipeline().fit_transform(X)
+    clf = RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=42).fit(F, y)
+    forest = CompiledForest.from_sklearn(clf)
+    err = forest.check_parity(clf, F)
+    print(f"{forest.n_nodes} nodes, depth {forest.max_depth}, max |diff| vs sklearn {err:.2g}")
+
+    results = {}
+    for n_jobs in (-1, 1):
+        clf.n_jobs = n_jobs
+        results[f"sklearn n_jobs={n_jobs}"] = (
+            _latency(lambda: clf.predict_proba(F[:1]), repeats),
+            _latency(lambda: clf.predict_proba(F), 5))
+    results["compiled"] = (
+        _latency(lambda: forest.predict_proba(F[:1]), repeats),
+        _latency(lambda: forest.predict_proba(F), 5))
+
+    print(f"{'backend':<20}{'1-row ms':>10}{f'{len(F)}-row ms':>12}")
+    for name, (single, batch) in results.items():
+        print(f"{name:<20}{single * 1000:>10.3f}{batch * 1000:>12.2f}")
+    return results
+
+def benchmark_routing(bots=5000, stations=(2, 64, 1024), ticks=5):
+    """
+    Low-battery routing cost per tick: scanning agents_list for stations
+    (the old seek_energy) vs the precomputed StationField lookup, and
+    charging cost per tick: every station scanning every agent (the old
+    RechargeStation.step) vs stations serving their charge_queue.
+    """
+    import random
+    from src.agents import NanoBot, RechargeStation
+    from src.environment import Bloodstream
+
+    print(f"{'stations':>9}{'build ms':>10}{'scan ms/tick':>14}{'field ms/tick':>15}"
+          f"{'charge scan ms':>16}{'charge queue ms':>17}")
+    results = {}
+    for n_stations in stations:
+        model = Bloodstream()
+        for _ in range(n_stations):
+            model.add_station(tuple(random.randrange(d) for d in model.space_dims))
+        for _ in range(bots):
+            model.add_bot()
+        fleet = [a for a in model.agents_list if isinstance(a, NanoBot)]
+        starts = [b.pos for b in fleet]
+
+        def scan():
+            for b in fleet:
+                found = [a for a in model.agents_list if isinstance(a, RechargeStation)]
+                b.move_towards(min(found, key=lambda s: b.get_distance(b.pos, s.pos)).pos)
+
+        def field():
+            for b in fleet:
+                b.seek_energy()
+
+        def charge_scan():
+            for s in model.stations:
+                for a in model.agents_list:
+                    if isinstance(a, NanoBot) and a.battery < 100 and s.get_distance(s.pos, a.pos) <= 5:
+                        a.battery = 20
+
+        def charge_queue():
+            model._charge_queues = (None, {}) # Re-bucket as on a new tick
+            for s in model.stations:
+                s.step()
+
+        build = _latency(lambda: model.move_station(model.stations[0], model.stations[0].pos) or model.station_field, 3)
+        timings = []
+        for fn in (scan, field, charge_scan, charge_queue):
+            for b, p in zip(fleet, starts):
+                b.pos = p
+                b.battery = 20
+            timings.append(_latency(fn, ticks))
+        results[n_stations] = (build, *timings)
+        print(f"{len(model.stations):>9}{build * 1000:>10.1f}"
+              + "".join(f"{t * 1000:>{w}.1f}" for t, w in zip(timings, (14, 15, 16, 17))))
+    return results
+
+def benchmark_allocation(cancer=(50, 400), bots=(20, 200), policies=("local", "greedy", "hungarian"),
+                         max_ticks=2000, seed=0):
+    """
+    Targeting policies on identical layouts: time spent choosing targets per
+    tick (per-bot scans + broadcasts for "local", the allocator otherwise)
+    and ticks until 95% of the cancer cells are neutralized. (Cells within a
+    station's charging radius can stay untreated, since bots arriving there
+    are switched to RECHARGING, so 100% is not a reliable end point.)
+    """
+    import random
+    from src.agents import Cell, NanoBot
+    from src.environment import Bloodstream
+
+    # Accumulate time spent in the local policy's targeting methods
+    spent = [0.0]
+    def timed(fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                spent[0] += time.perf_counter() - start
+        return wrapper
+    originals = NanoBot.scan_for_targets, NanoBot.broadcast_target
+
+    def cancer_count(model):
+        return sum(1 for a in model.agents_list if isinstance(a, Cell) and a.is_cancer)
+
+    print(f"{'cancer':>7}{'bots':>6}  {'policy':<10}{'alloc ms/tick':>14}{'ticks':>7}{'wall s':>8}")
+    results = []
+    for n_cancer, n_bots in zip(cancer, bots):
+        for policy in policies:
+            random.seed(seed)
+            np.random.seed(seed)
+            model = Bloodstream(targeting=policy)
+            for _ in range(n_cancer):
+                model.add_cancer()
+            for _ in range(n_bots):
+                model.add_bot()
+
+            spent[0] = 0.0
+            NanoBot.scan_for_targets, NanoBot.broadcast_target = (timed(f) for f in originals)
+            if model.allocator is not None:
+                model.allocator.assign = timed(model.allocator.assign)
+            goal = int(cancer_count(model) * 0.05)
+            ticks = 0
+            start = time.perf_counter()
+            try:
+                while ticks < max_ticks and cancer_count(model) > goal:
+                    model.step()
+                    ticks += 1
+            finally:
+                NanoBot.scan_for_targets, NanoBot.broadcast_target = originals
+            wall = time.perf_counter() - start
+
+            r = {"cancer": n_cancer, "bots": n_bots, "policy": policy,
+                 "alloc_ms": spent[0] * 1000 / max(ticks, 1), "ticks": ticks, "wall_s": wall}
+            results.append(r)
+            cleared = "" if ticks < max_ticks else "+"
+            print(f"{n_cancer:>7}{n_bots:>6}  {policy:<10}{r['alloc_ms']:>14.2f}{str(ticks) + cleared:>7}{wall:>8.1f}")
+    return results
+
+def benchmark_flow(agents=1_000_000, model_agents=(1000, 10000), repeats=5):
+    """
+    Flow advection cost: FlowField.advect on a raw (agents, 3) array per
+    field kind, then the full Bloodstream.advect (gather positions from the
+    agents, advect, write back) at model scale.
+    """
+    import random
+    from src.config import GRID_WIDTH, GRID_HEIGHT, GRID_DEPTH
+    from src.environment import Bloodstream
+    from src.flow import FlowField
+
+    dims = (GRID_WIDTH, GRID_HEIGHT, GRID_DEPTH)
+    positions = np.random.uniform(0, 1, (agents, 3)) * (np.array(dims) - 1)
+    results = {}
+    for kind in ("laminar", "vortex"):
+        field = FlowField(dims, kind)
+        results[kind] = _latency(lambda: field.advect(positions), repeats)
+        print(f"advect {agents:>9} positions ({kind:<7}) {results[kind] * 1000:>9.1f} ms/tick")
+
+    for n in model_agents:
+        model = Bloodstream(flow="laminar")
+        for _ in range(n):
+            (model.add_bot if random.random() < 0.2 else model.add_cancer)()
+        movers = len(model.agents_list) - len(model.stations)
+        results[f"model {movers}"] = _latency(model.advect, repeats)
+        print(f"Bloodstream.advect {movers:>9} agents     {results[f'model {movers}'] * 1000:>9.1f} ms/tick")
+    return results
+
+def benchmark_lifecycle(ticks=3000, inject_per_tick=1, bots=100, window=500):
+    """
+    Long run with continuous cancer injection, with and without lifecycle
+    compaction: agent count and mean tick time per window of ticks.
+    """
+    from src.agents import Cell
+    from src.environment import Bloodstream
+
+    results = {}
+    for interval in (0, 50):
+        model = Bloodstream(compact_interval=interval)
+        for _ in range(bots):
+            model.add_bot()
+        label = f"compact every {interval}" if interval else "no compaction"
+        print(f"-- {label}")
+        print(f"{'tick':>6}{'agents':>8}{'cells':>7}{'ms/tick':>9}")
+        rows = []
+        start = time.perf_counter()
+        for tick in range(1, ticks + 1):
+            for _ in range(inject_per_tick):
+                model.add_cancer()
+            model.step()
+            if tick % window == 0:
+                elapsed = time.perf_counter() - start
+                cells = sum(isinstance(a, Cell) for a in model.agents_list)
+                rows.append({"tick": tick, "agents": len(model.agents_list), "cells": cells,
+                             "ms_per_tick": elapsed * 1000 / window})
+                print(f"{tick:>6}{len(model.agents_list):>8}{cells:>7}{rows[-1]['ms_per_tick']:>9.2f}")
+                start = time.perf_counter()
+        model.collector.stop_collection()
+        results[label] = rows
+    return results
+
+BENCHMARKS = {
+    "features": benchmark_features,
+    "startup": benchmark_startup,
+    "synthetic": benchmark_synthetic,
+    "forest": benchmark_forest,
+    "routing": benchmark_routing,
+    "allocation": benchmark_allocation,
+    "flow": benchmark_flow,
+    "lifecycle": benchmark_lifecycle,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
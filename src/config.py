@@ -13,11 +13,86 @@ GRID_DEPTH = 50 # 3D Space
 CELL_COUNT = 30  # Number of biological cells
 INITIAL_CANCER_PCT = 0.2  # 20% start as cancer
 NANO_BOT_COUNT = 5
+ROUTING_VOXEL_SIZE = 2 # Resolution of the nearest-station lookup field (src/routing.py)
+
+# Bot targeting: "local" (each idle bot scans radius 10, ACTING bots broadcast
+# their target to idle neighbours) or a per-tick central allocator
+# (src/allocation.py): "greedy" or "hungarian" (needs scipy)
+TARGETING_POLICY = "local"
+MAX_BOTS_PER_CELL = 2
+
+# Bloodstream flow (src/flow.py): None (static), "laminar", "vortex" or the
+# path of a .npy velocity grid. Cells and bots are advected once per tick.
+FLOW_FIELD = None
+FLOW_STRENGTH = 0.5 # Units/tick on the vessel axis
+FLOW_BOUNDARY = "wrap" # "wrap" or "clamp" along the vessel
+
+# Agent lifecycle: every LIFECYCLE_COMPACT_INTERVAL ticks (0 = never) dead bots
+# and cells neutralized at least NEUTRALIZED_TTL ticks ago are despawned,
+# archived to audit_logs and dropped from the agent storage. Despawned
+# neutralized cells are still counted as healthy in every reported figure.
+LIFECYCLE_COMPACT_INTERVAL = 50
+NEUTRALIZED_TTL = 20
+
+# Diagnosis mode: cells carry images and SCANNING bots classify them with the
+# trained CellClassifier (batched once per tick, see src/diagnosis.py). Bots
+# scan nearby cells whatever their ground truth and treat those the classifier
+# flags, so misclassified healthy cells are treated and missed cancers survive.
+DIAGNOSIS_MODE = False
+DIAGNOSIS_IMAGE_SOURCE = "dataset" # "dataset" (DATA_DIR/test) or "synthetic"
+DIAGNOSIS_THRESHOLD = 0.5 # P(cancer) needed before a bot acts
+DIAGNOSIS_CACHE_SIZE = 4096
+
+# In-memory synthetic generation (src/data_generator.stream_synthetic)
+GENERATOR_BATCH_SIZE = 1024
+GENERATOR_WORKERS = None # None = one process per CPU
+STREAM_MAX_TREES = 200 # Forest size cap for train_model_streaming (reservoir-sampled over batches)
+STREAM_MIN_BATCH = 64 # Smaller batches are merged into the previous one before fitting
+
+# Desktop visualizer (src/visualization.py)
+VIS_FRAME_INTERVAL_MS = 50
+VIS_BLIT = True # Redraw only the animated artists when the backend supports blitting
+PARTICLE_CAPACITY = 4096 # Effect particles alive at once; extra emissions are dropped
+SIM_DECOUPLED = False # Step the model on a background thread instead of once per frame
+SIM_TICK_RATE = 20.0 # Target ticks/s when decoupled (None = as fast as possible)
+
+# Headless offline rendering (python -m src.render)
+RENDER_DIR = "renders"
+RENDER_WORKERS = None # None = one process per CPU
+RENDER_DPI = 80 # 16x9in figure -> 1280x720 frames
+RENDER_FPS = 30 # Video frame rate
 
 # Paths
 # Using the user-provided "Data copy" folder
 DATA_DIR = "Data copy" 
 MODEL_PATH = "models/cell_classifier.pkl"
+MODEL_MMAP_MODE = "r" # Memory-map model arrays read-only (None loads into RAM)
+MODEL_RELOAD_INTERVAL = 2.0 # Seconds between checks for a newly published model (None disables)
+
+# Incremental retraining (update_model / python -m src.model --update)
+INCREMENTAL_TREES = 10 # Trees added per update
+
+# Decoded/resized images are cached here as a memory-mapped .npy (see src/dataset.py)
+DATASET_CACHE_DIR = "cache/dataset"
+LOADER_WORKERS = None # None = one thread per CPU
+
+# Hyperparameter search (src/search.py, train_model(search=True))
+FEATURE_CACHE_DIR = "cache/features"
+SEARCH_CV_FOLDS = 5
+SEARCH_WORKERS = None # None = one process per CPU
+
+# Feature extraction used by train_model (see src/features.py)
+# "raw" reproduces the original flattened-pixel features
+FEATURE_PIPELINE = "gray"
+
+# Batched inference (CellClassifier.predict_batch)
+PREDICT_CHUNK_SIZE = 512
+PREDICT_N_JOBS = -1
+
+# /diagnose micro-batching (src/web/batching.py)
+DIAGNOSE_MAX_BATCH = 64 # Images per inference call
+DIAGNOSE_MAX_WAIT_MS = 5 # Max time a request waits for others to join its batch
+DIAGNOSE_WORKERS = 2 # Concurrent inference batches
 
 # Class Mapping for Reference
 # 0: adenocarcinoma...
@@ -1,4 +1,8 @@
 from src.database import DatabaseManager
+from src.metrics import REGISTRY
+import time
+
+TICK_PHASE_SECONDS = REGISTRY.histogram("sim_tick_phase_seconds", "Wall time of each Bloodstream.step phase", labelnames=("phase",))
 
 class DataCollector:
     def __init__(self, db_manager: DatabaseManager):
@@ -24,15 +28,19 @@ class DataCollector:
             return
 
         self.current_tick += 1
+        start = time.perf_counter()
         
         # Calculate Metrics
         cells = [a for a in model.agents_list if a.__class__.__name__ == 'Cell']
         bots = [a for a in model.agents_list if a.__class__.__name__ == 'NanoBot']
         
-        healthy = len([c for c in cells if not c.is_cancer])
+        # Neutralized cells despawned by compaction still count as healthy,
+        # so the series stay comparable with runs that never compact
+        archived = model.archived_healthy
+        healthy = len([c for c in cells if not c.is_cancer]) + archived
         cancer = len([c for c in cells if c.is_cancer])
         active_bots = len([b for b in bots if b.state != "IDLE"])
-        total_cells = len(cells)
+        total_cells = len(cells) + archived
         efficiency = (active_bots / len(bots)) * 100 if bots else 0
 
         metrics = {
@@ -43,7 +51,11 @@ class DataCollector:
             'total_cells': total_cells
         }
         
+        computed = time.perf_counter()
+        TICK_PHASE_SECONDS.observe(computed - start, phase="collect")
+
         self.db.log_metrics(self.run_id, self.current_tick, metrics)
+        TICK_PHASE_SECONDS.observe(time.perf_counter() - computed, phase="db_commit")
         
         # Check for events (example: significant population shifts)
         # In a real scenario, agents would emit events, but for now we monitor state changes here if needed
@@ -2,7 +2,8 @@ import cv2
 import numpy as np
 import os
 import random
-from src.config import IMG_SIZE, DATA_DIR
+from concurrent.futures import ProcessPoolExecutor
+from src.config import IMG_SIZE, DATA_DIR, GENERATOR_BATCH_SIZE, GENERATOR_WORKERS
 
 def create_healthy_cell(size=128):
     """Generates a smooth, circular healthy cell."""
@@ -52,6 +53,107 @@ def create_cancer_cell(size=128):
 
     return img
 
+def create_cell_image(is_cancer, size=IMG_SIZE):
+    """One synthetic cell image with background noise, as written by generate_dataset."""
+    if is_cancer:
+        img = create_cancer_cell(size)
+    else:
+        img = create_healthy_cell(size)
+    
+    # Add background noise to whole image
+    bg_noise = np.random.randint(0, 20, (size, size), dtype=np.uint8)
+    return cv2.add(img, bg_noise)
+
+# --- Batched / parallel generation (in memory, no PNG round trip) ---
+# Same drawing recipe as create_healthy_cell/create_cancer_cell, but every random
+# parameter and all noise come from one np.random.Generator, drawn for the whole
+# batch at once. Each worker gets its own generator spawned from a SeedSequence.
+
+def _saturating_add(imgs, noise):
+    # Vectorized equivalent of cv2.add on uint8
+    return np.minimum(imgs.astype(np.uint16) + noise, 255).astype(np.uint8)
+
+def create_healthy_batch(rng, n, size=IMG_SIZE):
+    imgs = np.zeros((n, size, size), dtype=np.uint8)
+    c = size // 2
+    radii = rng.integers(30, 46, n)
+    nucleus_radii = rng.integers(5, 11, n)
+    offsets = rng.integers(-5, 6, (n, 2))
+    for i in range(n):
+        cv2.circle(imgs[i], (c, c), int(radii[i]), 200, -1)
+        cv2.circle(imgs[i], (c + int(offsets[i, 0]), c + int(offsets[i, 1])), int(nucleus_radii[i]), 100, -1)
+        imgs[i] = cv2.GaussianBlur(imgs[i], (5, 5), 0)
+    return imgs
+
+def create_cancer_batch(rng, n, size=IMG_SIZE):
+    imgs = np.zeros((n, size, size), dtype=np.uint8)
+    c = size // 2
+    angles = np.radians(np.arange(0, 360, 10))
+    radii = rng.integers(30, 46, (n, 1)) + rng.integers(-15, 16, (n, len(angles)))  # Irregularity
+    pts = np.stack([c + radii * np.cos(angles), c + radii * np.sin(angles)], axis=2).astype(np.int32)
+    for i in range(n):
+        cv2.fillPoly(imgs[i], [pts[i]], 200)
+
+    # High-frequency noise/texture (malignancy features)
+    imgs = _saturating_add(imgs, rng.integers(0, 50, (n, size, size), dtype=np.uint8))
+
+    # Multiple chaotic nuclei
+    counts = rng.integers(2, 6, n)
+    nuclei = rng.integers((40, 40, 3), (91, 91, 9), (n, 5, 3))
+    for i in range(n):
+        for nx, ny, nr in nuclei[i, :counts[i]]:
+            cv2.circle(imgs[i], (int(nx), int(ny)), int(nr), 50, -1)
+    return imgs
+
+def generate_batch(n, seed=None, size=IMG_SIZE):
+    """
+    Returns (images, labels): a balanced, shuffled uint8 (n, size, size, 3) BGR
+    stack (as cv2.imread returns the PNGs) and 'cancer'/'healthy' labels.
+    """
+    gray, labels = _generate_gray_batch(n, seed, size)
+    return _to_bgr(gray), labels
+
+def _to_bgr(gray):
+    return np.repeat(gray[:, :, :, None], 3, axis=3)
+
+def _generate_gray_batch(n, seed, size):
+    rng = np.random.default_rng(seed)
+    n_cancer = n // 2
+    gray = np.concatenate([create_cancer_batch(rng, n_cancer, size), create_healthy_batch(rng, n - n_cancer, size)])
+    gray = _saturating_add(gray, rng.integers(0, 20, gray.shape, dtype=np.uint8))
+    labels = np.array(['cancer'] * n_cancer + ['healthy'] * (n - n_cancer))
+
+    order = rng.permutation(n)
+    return gray[order], labels[order]
+
+def _generate_batch_task(args):
+    # Workers ship single-channel images; channels are expanded in the parent (1/3 the IPC)
+    return _generate_gray_batch(*args)
+
+def stream_synthetic(total, batch_size=GENERATOR_BATCH_SIZE, workers=GENERATOR_WORKERS, seed=0, size=IMG_SIZE):
+    """
+    Yields (images, labels) batches totalling `total` samples, generated on a
+    process pool with independent seeded RNGs. Results arrive in order and at
+    most 2 batches per worker are in flight, so memory stays bounded.
+    """
+    sizes = [batch_size] * (total // batch_size)
+    if total % batch_size:
+        sizes.append(total % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(n, s, size) for n, s in zip(sizes, seeds)]
+
+    workers = workers or os.cpu_count()
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(_generate_batch_task, t) for t in tasks[:window]]
+        next_task = len(pending)
+        while pending:
+            gray, labels = pending.pop(0).result()
+            if next_task < len(tasks):
+                pending.append(pool.submit(_generate_batch_task, tasks[next_task]))
+                next_task += 1
+            yield _to_bgr(gray), labels
+
 def generate_dataset(num_train=200, num_test=50):
     print(f"Generating synthetic dataset in {DATA_DIR}...")
     
@@ -65,14 +167,7 @@ def generate_dataset(num_train=200, num_test=50):
             
             print(f"  Generating {count} {split} images for {cat}...")
             for i in range(count):
-                if cat == 'healthy':
-                    img = create_healthy_cell(IMG_SIZE)
-                else:
-                    img = create_cancer_cell(IMG_SIZE)
-                
-                # Add background noise to whole image
-                bg_noise = np.random.randint(0, 20, (IMG_SIZE, IMG_SIZE), dtype=np.uint8)
-                img = cv2.add(img, bg_noise)
+                img = create_cell_image(cat == 'cancer', IMG_SIZE)
                 
                 filename = os.path.join(path, f"{cat}_{i}.png")
                 cv2.imwrite(filename, img)
@@ -0,0 +1,117 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from src.config import IMG_SIZE, DATA_DIR, DATASET_CACHE_DIR, LOADER_WORKERS
+
+# Decoded-image cache.
+# The resized dataset lives in <cache_dir>/images.npy (uint8, N x S x S x 3) and is
+# returned memory-mapped. manifest.json records, per row, the source path, label,
+# mtime and size, plus IMG_SIZE; later runs reuse every row whose file is unchanged
+# and only decode new or modified files.
+
+MANIFEST_VERSION = 1
+
+def scan_dataset(root):
+    """Lists (path, label, mtime_ns, size) for every image under root/<label>/, sorted."""
+    entries = []
+    for label in sorted(os.listdir(root)):
+        if label.startswith('.'): continue
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder): continue
+        for file in sorted(os.listdir(folder)):
+            if file.startswith('.'): continue
+            path = os.path.join(folder, file)
+            st = os.stat(path)
+            entries.append({"path": path, "label": label, "mtime_ns": st.st_mtime_ns, "size": st.st_size})
+    return entries
+
+def decode_image(path, img_size=IMG_SIZE):
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    return cv2.resize(img, (img_size, img_size))
+
+def _read_manifest(cache_dir, img_size):
+    path = os.path.join(cache_dir, "manifest.json")
+    if not os.path.exists(path) or not os.path.exists(os.path.join(cache_dir, "images.npy")):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("img_size") != img_size:
+        return None
+    return manifest
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, "manifest.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def _same_file(a, b):
+    return a["mtime_ns"] == b["mtime_ns"] and a["size"] == b["size"]
+
+def load_dataset(root=None, cache_dir=DATASET_CACHE_DIR, img_size=IMG_SIZE, workers=LOADER_WORKERS):
+    """
+    Returns (images, labels, entries). images is a read-only memmap over the
+    cache; rows of unreadable files are dropped (which costs one copy).
+    """
+    if root is None:
+        root = os.path.join(DATA_DIR, 'train')
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path = os.path.join(cache_dir, "images.npy")
+
+    entries = scan_dataset(root)
+    manifest = _read_manifest(cache_dir, img_size)
+    old_files = manifest["files"] if manifest else []
+
+    unchanged = len(old_files) == len(entries) and all(
+        o["path"] == e["path"] and _same_file(o, e) for o, e in zip(old_files, entries))
+
+    if not unchanged:
+        old_rows = {o["path"]: (row, o) for row, o in enumerate(old_files)}
+        reuse, todo = [], []
+        for i, e in enumerate(entries):
+            hit = old_rows.get(e["path"])
+            if hit is not None and _same_file(hit[1], e):
+                e["ok"] = hit[1]["ok"]
+                reuse.append((i, hit[0]))
+            else:
+                todo.append(i)
+        print(f"Dataset cache: reusing {len(reuse)} images, decoding {len(todo)}")
+
+        tmp_path = os.path.join(cache_dir, "images.tmp.npy")
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8,
+                                        shape=(len(entries), img_size, img_size, 3))
+        if reuse:
+            old = np.load(data_path, mmap_mode="r")
+            for dst, src in reuse:
+                out[dst] = old[src]
+            del old
+
+        def work(i):
+            img = decode_image(entries[i]["path"], img_size)
+            entries[i]["ok"] = img is not None
+            if img is not None:
+                out[i] = img
+
+        # cv2.imread/resize release the GIL, so threads decode in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(work, todo))
+
+        out.flush()
+        del out
+        os.replace(tmp_path, data_path)
+        _write_manifest(cache_dir, {"version": MANIFEST_VERSION, "img_size": img_size, "files": entries})
+    else:
+        entries = old_files
+
+    images = np.load(data_path, mmap_mode="r")
+    labels = np.array([e["label"] for e in entries])
+    ok = np.array([e["ok"] for e in entries], dtype=bool)
+    if not ok.all():
+        images, labels = images[ok], labels[ok]
+        entries = [e for e in entries if e["ok"]]
+    return images, labels, entries
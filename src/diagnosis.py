@@ -0,0 +1,148 @@
+import hashlib
+import os
+import random
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+from src.config import (DATA_DIR, DIAGNOSIS_IMAGE_SOURCE, DIAGNOSIS_THRESHOLD, DIAGNOSIS_CACHE_SIZE,
+                        PREDICT_CHUNK_SIZE, PREDICT_N_JOBS)
+from src.data_generator import create_cell_image
+from src.dataset import scan_dataset, decode_image
+from src.metrics import REGISTRY
+from src.model import CellClassifier, preprocess_image
+
+DIAGNOSIS_SECONDS = REGISTRY.histogram("diagnosis_inference_seconds", "Per-tick batched classifier inference time")
+DIAGNOSIS_BATCH = REGISTRY.histogram("diagnosis_batch_size", "Distinct images classified per tick",
+                                     buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+DIAGNOSIS_CACHE = REGISTRY.counter("diagnosis_cache_lookups", "Diagnosis cache lookups", labelnames=("result",))
+DIAGNOSIS_PENDING = REGISTRY.gauge("diagnosis_pending", "Scans waiting for the next batched inference")
+
+def image_key(image):
+    """Content hash used as the diagnosis cache key."""
+    return hashlib.blake2b(np.ascontiguousarray(image).tobytes(), digest_size=16).hexdigest()
+
+class CellImageBank:
+    """
+    Supplies microscope images for simulated cells.
+    "dataset" samples DATA_DIR/test ('normal' -> healthy, other classes -> cancer);
+    "synthetic" draws images with src.data_generator.
+    """
+    def __init__(self, source=DIAGNOSIS_IMAGE_SOURCE):
+        test_dir = os.path.join(DATA_DIR, 'test')
+        if source == "dataset" and not os.path.isdir(test_dir):
+            print(f"{test_dir} not found, using synthetic cell images.")
+            source = "synthetic"
+        self.source = source
+        self._decoded = {} # path -> preprocessed image
+        self.paths = {True: [], False: []}
+        if source == "dataset":
+            for e in scan_dataset(test_dir):
+                healthy = 'normal' in e["label"] or 'healthy' in e["label"]
+                self.paths[not healthy].append(e["path"])
+
+    def sample(self, is_cancer):
+        if self.source == "synthetic" or not self.paths[is_cancer]:
+            return preprocess_image(create_cell_image(is_cancer))
+
+        path = random.choice(self.paths[is_cancer])
+        img = self._decoded.get(path)
+        if img is None:
+            img = preprocess_image(decode_image(path))
+            self._decoded[path] = img
+        return img
+
+class DiagnosisEngine:
+    """
+    Classifies scanned cells for the simulation. Bots in SCANNING state call
+    lookup(); misses are queued and resolve() scores the whole queue with one
+    predict_batch call per tick. Results are kept in an LRU cache keyed by
+    image hash, so re-scanning a cell (or an identical image) is free.
+    The classifier is checked for a hot-reloaded model every tick and before
+    every cache lookup; a new model drops the cache and the verdicts already
+    written on cells, so they are rescanned with the new model.
+    """
+    def __init__(self, classifier=None, images=None, threshold=DIAGNOSIS_THRESHOLD, cache_size=DIAGNOSIS_CACHE_SIZE):
+        self.classifier = classifier if classifier is not None else CellClassifier()
+        # Without a model every score is the 0.5 fallback, which would flag every cell
+        self.classifier.load()
+        if self.classifier.model is None:
+            raise RuntimeError(f"Diagnosis mode needs a trained model at {self.classifier.path} "
+                               "(run python -m src.model)")
+        self.images = images if images is not None else CellImageBank()
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # image key -> P(cancer)
+        self.pending = {} # image key -> (image, [cells])
+        self.last_inference_s = 0.0
+        self._model_version = None
+        self._diagnosed = weakref.WeakSet() # Cells carrying a verdict from _model_version
+
+    def attach_image(self, cell):
+        cell.image = self.images.sample(cell.is_cancer)
+        cell.image_key = image_key(cell.image)
+        cell.diagnosis = None
+
+    def _check_version(self):
+        """Forgets every score from a previous model once the classifier has swapped in a new one."""
+        if self.classifier.version == self._model_version:
+            return
+        self._model_version = self.classifier.version
+        self.cache.clear()
+        for cell in list(self._diagnosed):
+            cell.diagnosis = None
+        self._diagnosed.clear()
+
+    def lookup(self, cell):
+        """Returns the cached P(cancer) for the cell, or queues it and returns None."""
+        self._check_version()
+        p = self.cache.get(cell.image_key)
+        if p is not None:
+            self.cache.move_to_end(cell.image_key)
+            DIAGNOSIS_CACHE.inc(result="hit")
+            cell.diagnosis = p
+            self._diagnosed.add(cell)
+            return p
+
+        entry = self.pending.get(cell.image_key)
+        if entry is None:
+            DIAGNOSIS_CACHE.inc(result="miss")
+            self.pending[cell.image_key] = (cell.image, [cell])
+        elif cell not in entry[1]:
+            entry[1].append(cell)
+        return None
+
+    def is_cleared(self, cell):
+        """True once the classifier has called this cell healthy."""
+        return cell.diagnosis is not None and cell.diagnosis < self.threshold
+
+    def resolve(self):
+        """Scores every pending scan in one batched inference call."""
+        # Also runs on ticks that only hit the cache, so a new model is noticed
+        self.classifier.maybe_reload()
+        self._check_version()
+        DIAGNOSIS_PENDING.set(len(self.pending))
+        if not self.pending:
+            self.last_inference_s = 0.0
+            return
+
+        keys = list(self.pending)
+        batch = np.stack([self.pending[k][0] for k in keys])
+        n_jobs = 1 if len(batch) < PREDICT_CHUNK_SIZE else PREDICT_N_JOBS
+
+        start = time.perf_counter()
+        probs = self.classifier.predict_batch(batch, n_jobs=n_jobs)
+        self.last_inference_s = time.perf_counter() - start
+        self._check_version() # predict_batch may have loaded or reloaded the model
+        DIAGNOSIS_SECONDS.observe(self.last_inference_s)
+        DIAGNOSIS_BATCH.observe(len(batch))
+
+        for key, p in zip(keys, probs):
+            p = float(p)
+            self.cache[key] = p
+            for cell in self.pending[key][1]:
+                cell.diagnosis = p
+                self._diagnosed.add(cell)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        self.pending.clear()
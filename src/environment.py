@@ -1,29 +1,70 @@
 from mesa import Model
 # from mesa.space import MultiGrid # Removing 2D grid
 from src.agents import Cell, NanoBot, RechargeStation
-from src.config import GRID_WIDTH, GRID_HEIGHT, GRID_DEPTH, CELL_COUNT, INITIAL_CANCER_PCT, NANO_BOT_COUNT
+from src.config import (GRID_WIDTH, GRID_HEIGHT, GRID_DEPTH, CELL_COUNT, INITIAL_CANCER_PCT, NANO_BOT_COUNT, DIAGNOSIS_MODE,
+                        ROUTING_VOXEL_SIZE, TARGETING_POLICY, MAX_BOTS_PER_CELL, FLOW_FIELD, FLOW_STRENGTH, FLOW_BOUNDARY,
+                        LIFECYCLE_COMPACT_INTERVAL, NEUTRALIZED_TTL)
 from src.database import DatabaseManager
-from src.data_collector import DataCollector
+from src.data_collector import DataCollector, TICK_PHASE_SECONDS
+from src.metrics import REGISTRY
+from src.routing import StationField
+import numpy as np
 import random
+import time
+
+TICK_SECONDS = REGISTRY.histogram("sim_tick_seconds", "Wall time of one Bloodstream.step")
+DOCKING_STATES = ("LOW_BATTERY", "RECHARGING")
+DESPAWNED = REGISTRY.counter("sim_despawned_agents_total", "Agents removed by lifecycle compaction", labelnames=("type", "reason"))
 
 class Bloodstream(Model):
     """
     Bloodstream Simulation Model (3D).
     """
-    def __init__(self):
+    def __init__(self, diagnosis=DIAGNOSIS_MODE, targeting=TARGETING_POLICY, flow=FLOW_FIELD,
+                 compact_interval=LIFECYCLE_COMPACT_INTERVAL):
         super().__init__()
         # self.grid = MultiGrid(GRID_WIDTH, GRID_HEIGHT, torus=False) # Removed
         self.space_dims = (GRID_WIDTH, GRID_HEIGHT, GRID_DEPTH)
         self.agents_list = [] # Manual scheduler list
+        self.agents_by_id = {} # unique_id -> agent, for O(1) lookups
+        self._next_id = 0 # Monotonic; ids of despawned agents are never reused
+        self.compact_interval = compact_interval # Ticks between lifecycle compactions, 0 = never
+        self.archived = {} # (type, reason) -> agents despawned so far
+        self.stations = []
+        self._station_field = None # Rebuilt lazily when stations change
+        self._charge_queues = (None, {}) # (tick, {station: [bots]}), see charge_queue
         self.running = True
         
+        # Diagnosis mode: cells get images and scans go through the classifier.
+        # Imported lazily so the plain simulation never loads sklearn.
+        self.diagnosis = None
+        if diagnosis:
+            from src.diagnosis import DiagnosisEngine
+            self.diagnosis = DiagnosisEngine()
+        
+        # Central target allocation replaces per-bot scans when enabled
+        self.allocator = None
+        if targeting != "local":
+            from src.allocation import TargetAllocator
+            self.allocator = TargetAllocator(targeting, max_per_cell=MAX_BOTS_PER_CELL)
+        
+        # Bloodstream flow; stations stay anchored, so the station field never goes stale
+        self.flow = None
+        if flow is not None:
+            from src.flow import FlowField
+            self.flow = FlowField(self.space_dims, flow, strength=FLOW_STRENGTH, boundary=FLOW_BOUNDARY)
+        
         # Data Collection
         self.db = DatabaseManager()
         self.collector = DataCollector(self.db)
         self.collector.start_collection({
             "cell_count": CELL_COUNT,
             "bot_count": NANO_BOT_COUNT,
-            "cancer_pct": INITIAL_CANCER_PCT
+            "cancer_pct": INITIAL_CANCER_PCT,
+            "diagnosis": bool(diagnosis),
+            "targeting": targeting,
+            "flow": flow,
+            "compact_interval": compact_interval
         })
         
         # Create Cells
@@ -38,7 +79,7 @@ class Bloodstream(Model):
             pos = (x, y, z)
             
             cell = Cell(i, self, pos, is_cancer=is_cancer)
-            self.agents_list.append(cell)
+            self.add_agent(cell)
 
         # Create NanoBots
         for i in range(NANO_BOT_COUNT):
@@ -47,13 +88,94 @@ class Bloodstream(Model):
             y = random.randrange(GRID_HEIGHT)
             z = random.randrange(GRID_DEPTH)
             bot.pos = (x, y, z)
-            self.agents_list.append(bot)
+            self.add_agent(bot)
 
         # Create Recharge Stations (2 Stations at opposite corners)
         station1 = RechargeStation(CELL_COUNT + NANO_BOT_COUNT + 1, self, (10, 10, 10))
         station2 = RechargeStation(CELL_COUNT + NANO_BOT_COUNT + 2, self, (GRID_WIDTH-10, GRID_HEIGHT-10, GRID_DEPTH-10))
-        self.agents_list.append(station1)
-        self.agents_list.append(station2)
+        self.add_agent(station1)
+        self.add_agent(station2)
+
+    def add_agent(self, agent):
+        """Registers an agent with the scheduler list and the id index."""
+        if self.diagnosis is not None and isinstance(agent, Cell):
+            self.diagnosis.attach_image(agent)
+        self.agents_list.append(agent)
+        self.agents_by_id[agent.unique_id] = agent
+        self._next_id = max(self._next_id, agent.unique_id + 1)
+        if isinstance(agent, RechargeStation):
+            self.stations.append(agent)
+            self._station_field = None
+
+    def next_id(self):
+        """Allocates a unique_id above every id handed out so far."""
+        uid = self._next_id
+        self._next_id += 1
+        return uid
+
+    @property
+    def archived_healthy(self):
+        """Neutralized cells despawned by compaction; reported counts add them back as healthy."""
+        return self.archived.get(("Cell", "neutralized"), 0)
+
+    def get_agent(self, unique_id):
+        return self.agents_by_id.get(unique_id)
+
+    @property
+    def station_field(self):
+        """Nearest-station lookup for low-battery routing (see src/routing.py)."""
+        if self._station_field is None:
+            self._station_field = StationField(self.space_dims, self.stations, voxel=ROUTING_VOXEL_SIZE)
+        return self._station_field
+
+    def charge_queue(self, station):
+        """
+        Bots below full battery whose nearest station is `station`. Every bot
+        is bucketed by station_field once per tick, so charging costs
+        O(bots + stations) per tick instead of each station scanning every agent.
+        """
+        tick, queues = self._charge_queues
+        if tick != self.steps:
+            queues = {}
+            bots = [a for a in self.agents_list if isinstance(a, NanoBot) and a.battery < 100]
+            if bots and self.stations:
+                field = self.station_field
+                nearest = field.nearest_many(np.array([b.pos for b in bots], dtype=float))
+                for bot, i in zip(bots, nearest.tolist()):
+                    queues.setdefault(field.stations[i], []).append(bot)
+            self._charge_queues = (self.steps, queues)
+        return queues.get(station, ())
+
+    def move_station(self, station, pos):
+        station.pos = pos
+        self._station_field = None
+
+    def select_bots(self, ids=None, region=None, states=None, battery_below=None, battery_above=None):
+        """
+        Returns the NanoBots matching every given filter.
+        region is a ((x0, y0, z0), (x1, y1, z1)) inclusive bounding box.
+        """
+        if ids is not None:
+            candidates = [self.agents_by_id.get(i) for i in ids]
+        else:
+            candidates = self.agents_list
+
+        selected = []
+        for bot in candidates:
+            if not isinstance(bot, NanoBot):
+                continue
+            if states is not None and bot.state not in states:
+                continue
+            if battery_below is not None and not bot.battery < battery_below:
+                continue
+            if battery_above is not None and not bot.battery > battery_above:
+                continue
+            if region is not None:
+                lo, hi = region
+                if not all(lo[k] <= bot.pos[k] <= hi[k] for k in range(3)):
+                    continue
+            selected.append(bot)
+        return selected
 
     @property
     def schedule(self):
@@ -63,26 +185,117 @@ class Bloodstream(Model):
         return FakeSchedule(self.agents_list)
 
     def step(self):
+        start = time.perf_counter()
         random.shuffle(self.agents_list)
+        shuffled = time.perf_counter()
+        TICK_PHASE_SECONDS.observe(shuffled - start, phase="shuffle")
+
+        if self.allocator is not None:
+            self.allocator.assign(self)
+            allocated = time.perf_counter()
+            TICK_PHASE_SECONDS.observe(allocated - shuffled, phase="allocate")
+            shuffled = allocated
+
         for agent in self.agents_list:
             agent.step()
+        stepped = time.perf_counter()
+        TICK_PHASE_SECONDS.observe(stepped - shuffled, phase="agents")
+
+        if self.flow is not None:
+            self.advect()
+            advected = time.perf_counter()
+            TICK_PHASE_SECONDS.observe(advected - stepped, phase="flow")
+            stepped = advected
+
+        # Resolve every scan queued this tick with one batched inference
+        if self.diagnosis is not None:
+            self.diagnosis.resolve()
+            TICK_PHASE_SECONDS.observe(time.perf_counter() - stepped, phase="diagnosis")
         
+        # log_step records its own "collect" and "db_commit" phases
         self.collector.log_step(self)
+        
+        if self.compact_interval and self.steps % self.compact_interval == 0:
+            logged = time.perf_counter()
+            self.compact()
+            TICK_PHASE_SECONDS.observe(time.perf_counter() - logged, phase="lifecycle")
+        TICK_SECONDS.observe(time.perf_counter() - start)
+
+    def despawn_reason(self, agent):
+        """Why agent should leave the simulation, or None while it is still live."""
+        if isinstance(agent, NanoBot):
+            if agent.battery <= 0:
+                return "battery_depleted"
+        elif isinstance(agent, Cell):
+            # Kept for a while after neutralization so renderers still show the healed cell
+            if agent.neutralized_at is not None and self.steps - agent.neutralized_at >= NEUTRALIZED_TTL:
+                return "neutralized"
+        return None
+
+    def compact(self):
+        """
+        Despawns dead bots and long-neutralized cells: rebuilds agents_list
+        without them, drops them from the id index and the Mesa registry,
+        and archives them to audit_logs as one "despawn" event. Returns the
+        number of agents removed.
+        """
+        live, despawned = [], []
+        for agent in self.agents_list:
+            reason = self.despawn_reason(agent)
+            if reason is None:
+                live.append(agent)
+            else:
+                despawned.append((agent, reason))
+        if not despawned:
+            return 0
+
+        self.agents_list = live
+        records = []
+        for agent, reason in despawned:
+            kind = agent.__class__.__name__
+            if self.agents_by_id.get(agent.unique_id) is agent:
+                del self.agents_by_id[agent.unique_id]
+            agent.remove()
+            self.archived[(kind, reason)] = self.archived.get((kind, reason), 0) + 1
+            DESPAWNED.inc(type=kind, reason=reason)
+            records.append({"id": agent.unique_id, "type": kind, "reason": reason, "pos": list(agent.pos)})
+        self.collector.log_custom_event("despawn", {"count": len(records), "agents": records})
+        return len(records)
+
+    def advect(self):
+        """
+        Moves every cell and bot with the flow in one vectorized update. Bots
+        heading to or docked at a station hold position like the stations do,
+        so the flow can't carry them out of charging range.
+        """
+        movers = [a for a in self.agents_list if isinstance(a, Cell)
+                  or (isinstance(a, NanoBot) and a.state not in DOCKING_STATES)]
+        if not movers:
+            return
+        positions = self.flow.advect(np.array([a.pos for a in movers], dtype=float))
+        for agent, pos in zip(movers, positions.tolist()):
+            agent.pos = tuple(pos)
 
     def add_cancer(self):
         # Spawn new cancer cell
-        idx = len(self.agents_list) + 1
+        idx = self.next_id()
         x = random.randrange(self.space_dims[0])
         y = random.randrange(self.space_dims[1])
         z = random.randrange(self.space_dims[2])
         cell = Cell(idx, self, (x, y, z), is_cancer=True)
-        self.agents_list.append(cell)
+        self.add_agent(cell)
 
     def add_bot(self):
-        idx = len(self.agents_list) + 1
+        idx = self.next_id()
         x = random.randrange(self.space_dims[0])
         y = random.randrange(self.space_dims[1])
         z = random.randrange(self.space_dims[2])
         bot = NanoBot(idx, self)
         bot.pos = (x, y, z)
-        self.agents_list.append(bot)
+        self.add_agent(bot)
+
+    def add_station(self, pos):
+        idx = self.next_id()
+        station = RechargeStation(idx, self, pos)
+        self.add_agent(station)
+        return station
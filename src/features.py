@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+
+# Feature extraction for CellClassifier.
+# A FeaturePipeline is fitted once at training time and pickled together with
+# the model, so inference applies exactly the same transform.
+
+class RawPixels:
+    """Baseline: flattened IMG_SIZE x IMG_SIZE x 3 pixels (49,152 features at 128px)."""
+    name = "raw"
+
+    def transform(self, images):
+        return images.reshape(len(images), -1)
+
+class DownsampledGray:
+    """Grayscale thumbnail, scaled to [0, 1]."""
+    name = "gray"
+
+    def __init__(self, size=32):
+        self.size = size
+
+    def transform(self, images):
+        out = np.empty((len(images), self.size * self.size), dtype=np.float32)
+        for i, img in enumerate(images):
+            gray = _to_gray(img)
+            small = cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA)
+            out[i] = small.ravel()
+        out /= 255.0
+        return out
+
+class HOGTexture:
+    """
+    HOG descriptor of a 64x64 grayscale view plus global texture statistics
+    (intensity moments/histogram, gradient energy, Laplacian variance).
+    """
+    name = "hog"
+
+    def __init__(self, size=64, cell=8, bins=9, hist_bins=16):
+        self.size = size
+        self.cell = cell
+        self.bins = bins
+        self.hist_bins = hist_bins
+
+    def _hog(self, gray):
+        # Unsigned-gradient HOG with 2x2-cell L2-normalized blocks, computed with
+        # NumPy since cv2.HOGDescriptor is not shipped with every OpenCV build.
+        g = gray.astype(np.float32)
+        gx = cv2.Sobel(g, cv2.CV_32F, 1, 0, ksize=1)
+        gy = cv2.Sobel(g, cv2.CV_32F, 0, 1, ksize=1)
+        mag = np.sqrt(gx * gx + gy * gy)
+        ang = np.degrees(np.arctan2(gy, gx)) % 180.0
+        bin_idx = np.minimum((ang * (self.bins / 180.0)).astype(np.int64), self.bins - 1)
+
+        n = self.size // self.cell
+        rows = np.arange(self.size) // self.cell
+        cell_idx = rows[:, None] * n + rows[None, :]
+        hist = np.bincount((cell_idx * self.bins + bin_idx).ravel(), weights=mag.ravel(),
+                           minlength=n * n * self.bins).reshape(n, n, self.bins)
+
+        blocks = np.concatenate([hist[:-1, :-1], hist[1:, :-1], hist[:-1, 1:], hist[1:, 1:]], axis=2)
+        blocks /= np.sqrt((blocks * blocks).sum(axis=2, keepdims=True) + 1e-6)
+        return blocks.ravel().astype(np.float32)
+
+    def transform(self, images):
+        rows = []
+        for img in images:
+            gray = cv2.resize(_to_gray(img), (self.size, self.size), interpolation=cv2.INTER_AREA)
+            h = self._hog(gray)
+
+            g = gray.astype(np.float32) / 255.0
+            gx = cv2.Sobel(g, cv2.CV_32F, 1, 0, ksize=3)
+            gy = cv2.Sobel(g, cv2.CV_32F, 0, 1, ksize=3)
+            mag = np.sqrt(gx * gx + gy * gy)
+            lap = cv2.Laplacian(g, cv2.CV_32F)
+            hist = np.histogram(g, bins=self.hist_bins, range=(0.0, 1.0))[0] / g.size
+            stats = np.array([g.mean(), g.std(), mag.mean(), mag.std(), lap.var()], dtype=np.float32)
+
+            rows.append(np.concatenate([h, stats, hist.astype(np.float32)]))
+        return np.asarray(rows, dtype=np.float32)
+
+class PCAReducer:
+    """IncrementalPCA fitted chunk by chunk so the full feature matrix never has to fit in RAM."""
+    name = "pca"
+
+    def __init__(self, n_components=64):
+        self.n_components = n_components
+        self.pca = None
+
+    def partial_fit(self, X):
+        from sklearn.decomposition import IncrementalPCA
+        if self.pca is None:
+            n = min(self.n_components, X.shape[0], X.shape[1])
+            self.pca = IncrementalPCA(n_components=n)
+        self.pca.partial_fit(X)
+
+    def finalize(self):
+        # float32 halves the pickled size of the projection basis
+        self.pca.components_ = self.pca.components_.astype(np.float32)
+        self.pca.mean_ = self.pca.mean_.astype(np.float32)
+
+    def transform(self, X):
+        return self.pca.transform(X).astype(np.float32)
+
+class FeaturePipeline:
+    """
+    Concatenates the outputs of several extractors and optionally reduces
+    them with PCA. fit() streams images in chunks.
+    """
+    def __init__(self, extractors, reducer=None, chunk_size=256):
+        self.extractors = extractors
+        self.reducer = reducer
+        self.chunk_size = chunk_size
+
+    @property
+    def name(self):
+        parts = [e.name for e in self.extractors]
+        if self.reducer is not None:
+            parts.append(self.reducer.name)
+        return "+".join(parts)
+
+    def _extract(self, images):
+        feats = [e.transform(images) for e in self.extractors]
+        return feats[0] if len(feats) == 1 else np.hstack(feats)
+
+    def _chunks(self, n):
+        step = self.chunk_size
+        if self.reducer is not None:
+            # IncrementalPCA needs every batch to hold at least n_components rows
+            step = max(step, self.reducer.n_components)
+        n_chunks = max(1, n // step)
+        return np.array_split(np.arange(n), n_chunks)
+
+    def fit(self, images):
+        if self.reducer is not None:
+            for idx in self._chunks(len(images)):
+                self.reducer.partial_fit(self._extract(images[idx[0]:idx[-1] + 1]))
+            self.reducer.finalize()
+        return self
+
+    def transform(self, images):
+        out = []
+        for start in range(0, len(images), self.chunk_size):
+            feats = self._extract(images[start:start + self.chunk_size])
+            if self.reducer is not None:
+                feats = self.reducer.transform(feats)
+            out.append(feats)
+        return np.vstack(out)
+
+    def fit_transform(self, images):
+        return self.fit(images).transform(images)
+
+def _to_gray(img):
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def build_pipeline(name="gray"):
+    """
+    Named pipelines:
+      raw     - flattened pixels (legacy behaviour)
+      gray    - 32x32 grayscale thumbnail
+      hog     - HOG + texture statistics
+      compact - gray + hog reduced to 64 PCA components
+    """
+    if name == "raw":
+        return FeaturePipeline([RawPixels()])
+    if name == "gray":
+        return FeaturePipeline([DownsampledGray()])
+    if name == "hog":
+        return FeaturePipeline([HOGTexture()])
+    if name == "compact":
+        return FeaturePipeline([DownsampledGray(), HOGTexture()], reducer=PCAReducer(64))
+    raise ValueError(f"Unknown feature pipeline: {name}")
@@ -0,0 +1,76 @@
+import numpy as np
+
+class FlowField:
+    """
+    Steady 3D velocity field of the bloodstream, evaluated for all agents at
+    once. The vessel runs along x, centred in the (y, z) cross-section:
+
+      "laminar"  Poiseuille tube flow, strength at the axis and 0 at the wall
+      "vortex"   laminar flow plus a solid-body swirl around the axis
+                 (strength at the wall, none in the corners outside it)
+      <path>     a .npy array of shape (nx, ny, nz, 3) sampled uniformly over
+                 space_dims (nearest-sample lookup)
+
+    advect() moves an (n, 3) position array by one tick. Along the flow
+    axis positions wrap (what leaves downstream re-enters upstream) when
+    boundary="wrap", or stop at the end when "clamp"; the vessel wall (y, z)
+    always clamps.
+    """
+    def __init__(self, space_dims, kind="laminar", strength=0.5, boundary="wrap"):
+        self.dims = np.asarray(space_dims, dtype=float)
+        self.kind = kind
+        self.strength = strength
+        self.boundary = boundary
+        self.centre = (self.dims[1:] - 1) / 2.0
+        self.radius = max(float(self.centre.min()), 1.0)
+        self.grid = None
+        if kind not in ("laminar", "vortex"):
+            self.grid = np.load(kind, mmap_mode="r")
+            if self.grid.ndim != 4 or self.grid.shape[3] != 3:
+                raise ValueError(f"Flow grid {kind} must have shape (nx, ny, nz, 3), got {self.grid.shape}")
+
+    def velocity(self, positions):
+        """Velocity (units per tick) at each row of an (n, 3) array."""
+        p = np.asarray(positions, dtype=float)
+        if self.grid is not None:
+            shape = np.array(self.grid.shape[:3])
+            idx = np.clip((p / self.dims * shape).astype(np.int64), 0, shape - 1)
+            return np.asarray(self.grid[idx[:, 0], idx[:, 1], idx[:, 2]], dtype=float)
+
+        offset = p[:, 1:] - self.centre # (y, z) from the vessel axis
+        r2 = (offset ** 2).sum(axis=1) / self.radius ** 2
+        v = np.zeros_like(p)
+        v[:, 0] = self.strength * np.clip(1.0 - r2, 0.0, None)
+        if self.kind == "vortex":
+            # Solid-body swirl inside the vessel: tangential speed grows linearly from the axis
+            inside = (r2 <= 1.0) * self.strength / self.radius
+            v[:, 1] = -inside * offset[:, 1]
+            v[:, 2] = inside * offset[:, 0]
+        return v
+
+    def advect(self, positions, dt=1.0):
+        """
+        New positions after dt ticks of flow, with boundary handling. Grids
+        use explicit Euler; the analytic fields are integrated exactly (the
+        axial speed only depends on the radius, which the swirl preserves,
+        so the swirl is applied as a rotation and agents don't spiral out).
+        """
+        p = np.asarray(positions, dtype=float)
+        if self.grid is not None:
+            p = p + self.velocity(p) * dt
+        else:
+            p = p.copy()
+            offset = p[:, 1:] - self.centre
+            r2 = (offset ** 2).sum(axis=1) / self.radius ** 2
+            p[:, 0] += self.strength * np.clip(1.0 - r2, 0.0, None) * dt
+            if self.kind == "vortex":
+                angle = (r2 <= 1.0) * self.strength / self.radius * dt
+                c, s = np.cos(angle), np.sin(angle)
+                p[:, 1] = self.centre[0] + c * offset[:, 0] - s * offset[:, 1]
+                p[:, 2] = self.centre[1] + s * offset[:, 0] + c * offset[:, 1]
+        if self.boundary == "wrap":
+            p[:, 0] %= self.dims[0]
+        else:
+            np.clip(p[:, 0], 0.0, self.dims[0] - 1, out=p[:, 0])
+        np.clip(p[:, 1:], 0.0, self.dims[1:] - 1, out=p[:, 1:])
+        return p
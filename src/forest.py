@@ -0,0 +1,97 @@
+import numpy as np
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into NumPy node arrays.
+    All trees share one node table; every sample walks every tree at once,
+    one level per vectorized step, so predict_proba on a single row costs a
+    few dozen array ops instead of sklearn's validation + per-tree dispatch.
+
+    Leaves point to themselves (threshold = +inf, both children = self) so the
+    walk needs no branching and simply runs for max_depth steps. Children are
+    stored interleaved, so one step is a single gather at 2 * node + go_right.
+    Exposes classes_ and predict_proba like the sklearn estimator, and its
+    arrays memory-map cleanly from a joblib artifact.
+    """
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        self.n_jobs = 1 # Accepted for interface parity with sklearn; evaluation is single-threaded
+
+    @classmethod
+    def from_sklearn(cls, clf, check_X=None):
+        """Compiles clf; if check_X is given, verifies predict_proba parity on it."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in clf.estimators_:
+            t = est.tree_
+            n = t.node_count
+            ids = np.arange(n)
+            is_leaf = t.children_left == -1
+
+            features.append(np.where(is_leaf, 0, t.feature))
+            thresholds.append(np.where(is_leaf, np.inf, t.threshold))
+            lefts.append(np.where(is_leaf, ids, t.children_left) + offset)
+            rights.append(np.where(is_leaf, ids, t.children_right) + offset)
+
+            # Per-node class distribution, normalized as in DecisionTreeClassifier.predict_proba
+            v = t.value[:, 0, :]
+            values.append(v / np.maximum(v.sum(axis=1, keepdims=True), 1e-300))
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, t.max_depth)
+
+        children = np.empty(2 * offset, dtype=np.int64)
+        children[0::2] = np.concatenate(lefts)
+        children[1::2] = np.concatenate(rights)
+
+        forest = cls(
+            feature=np.concatenate(features).astype(np.int64),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=children,
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.array(roots, dtype=np.int64),
+            classes=np.asarray(clf.classes_),
+            max_depth=int(max_depth),
+        )
+        if check_X is not None:
+            forest.check_parity(clf, check_X)
+        return forest
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_samples, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        row_base = (np.arange(len(X)) * X.shape[1])[:, None]
+        idx = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_right = flat[row_base + self.feature[idx]] > self.threshold[idx]
+            idx = self.children[2 * idx + go_right]
+        return idx
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def check_parity(self, clf, X, atol=1e-9):
+        """Raises if predict_proba differs from the sklearn forest on X."""
+        expected = clf.predict_proba(X)
+        got = self.predict_proba(X)
+        err = float(np.max(np.abs(expected - got))) if len(X) else 0.0
+        if err > atol:
+            raise RuntimeError(f"Compiled forest disagrees with sklearn (max abs diff {err:.3g})")
+        return err
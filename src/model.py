@@ -1,126 +1,566 @@
+import copy
+import hashlib
+import json
 import os
+import pickle
+import sys
+import threading
+import time
 import cv2
 import numpy as np
-import pickle
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-from src.config import IMG_SIZE, DATA_DIR, MODEL_PATH
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from src.config import (IMG_SIZE, DATA_DIR, MODEL_PATH, FEATURE_PIPELINE, PREDICT_CHUNK_SIZE, PREDICT_N_JOBS, MODEL_MMAP_MODE, MODEL_RELOAD_INTERVAL, INCREMENTAL_TREES,
+                        STREAM_MAX_TREES, STREAM_MIN_BATCH, FEATURE_CACHE_DIR)
+from src.features import build_pipeline
+from src.dataset import load_dataset, decode_image
+from src.forest import CompiledForest
 
 # Update config path for sklearn pickle
 RF_MODEL_PATH = MODEL_PATH.replace('.h5', '.pkl')
 
+# sklearn (~1s to import) and joblib are only imported when a model is
+# actually trained or loaded, keeping CLI/server startup fast.
+
 class CellClassifier:
-    def __init__(self):
-        self.model = None
-        if os.path.exists(RF_MODEL_PATH):
-            print(f"Loading RF model from {RF_MODEL_PATH}")
-            with open(RF_MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
+    """
+    Loads the model artifact lazily on first prediction (or explicit load()).
+    Artifacts are uncompressed joblib files, so their NumPy arrays are
+    memory-mapped read-only and shared between processes through the page cache.
+    Current artifacts hold a CompiledForest as "model"; legacy ones hold the
+    sklearn estimator itself. Both expose classes_ and predict_proba.
+
+    The artifact is re-checked at most every reload_interval seconds and a newer
+    one (published atomically by save_model/update_model) is swapped in as a
+    single (model, features, normal_idx) tuple, so in-flight predictions keep
+    using the old model and inference never pauses.
+    """
+    def __init__(self, path=RF_MODEL_PATH, mmap_mode=MODEL_MMAP_MODE, lazy=True, reload_interval=MODEL_RELOAD_INTERVAL):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        self.reload_interval = reload_interval
+        self._active = (None, None, -1) # (model, features, normal_idx)
+        self._version = None # (mtime_ns, inode) of the loaded artifact
+        self._last_check = 0.0
+        self.loaded = False
+        self._lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    @property
+    def version(self):
+        """Identifies the loaded artifact; changes when a new one is swapped in."""
+        return self._version
+
+    @property
+    def model(self):
+        return self._active[0]
+
+    @property
+    def features(self):
+        return self._active[1]
+
+    @property
+    def normal_idx(self):
+        return self._active[2]
+
+    def load(self):
+        with self._lock:
+            if self.loaded:
+                return
+            self._load()
+            self.loaded = True
+
+    def _artifact_version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino)
+
+    def _load(self):
+        version = self._artifact_version()
+        if version is not None:
+            import joblib
+            print(f"Loading RF model from {self.path}")
+            # joblib also reads plain pickles written by older versions
+            artifact = joblib.load(self.path, mmap_mode=self.mmap_mode)
+            if isinstance(artifact, dict):
+                model = artifact["model"]
+                features = artifact["features"]
+            else:
+                # Legacy artifact: bare estimator trained on raw pixels
+                model = artifact
+                features = build_pipeline("raw")
+            self._active = (model, features, _resolve_normal_index(model))
         else:
             print("Model not found. Please train first.")
+        self._version = version
+        self._last_check = time.monotonic()
+
+    def reload_if_changed(self):
+        """Swaps in a newly published artifact. Returns True if one was loaded."""
+        self._last_check = time.monotonic()
+        if self._artifact_version() == self._version:
+            return False
+        # Non-blocking: if another thread is already reloading, keep serving
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self._artifact_version() == self._version:
+                return False
+            self._load()
+            return True
+        finally:
+            self._lock.release()
+
+    def maybe_reload(self):
+        """reload_if_changed, at most once per reload_interval (no-op before the first load)."""
+        if self.loaded and self.reload_interval is not None and time.monotonic() - self._last_check > self.reload_interval:
+            self.reload_if_changed()
 
     def predict(self, image):
         """
         Predicts probability of cancer (0.0 - 1.0).
         Image should be (128, 128) grayscale or RGB.
         """
-        if self.model:
-            # Preprocess to match training (Flattened)
-            img = cv2.resize(image, (IMG_SIZE, IMG_SIZE))
-            # Convert to RGB if grayscale
-            if len(img.shape) == 2:
-                img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
-            
-            # Flatten
-            flat_data = img.flatten().reshape(1, -1)
-            
-            # Predict
-            probs = self.model.predict_proba(flat_data)[0]
-            
-            # Classes are likely sorted alphabetical: 
-            # 0: adenocarcinoma, 1: large.cell, 2: normal, 3: squamous
-            # We want P(Cancer) = 1 - P(Normal)
-            # We need to rely on the fact that 'normal' is index 2.
-            # Ideally we check model classes_ but for this demo:
-            classes = self.model.classes_
-            normal_idx = -1
-            for i, c in enumerate(classes):
-                if 'normal' in c:
-                    normal_idx = i
-                    break
-            
-            if normal_idx != -1:
-                p_normal = probs[normal_idx]
-                return 1.0 - p_normal
-            else:
-                # Fallback if 'normal' name not found exactly?
-                # Assume 0 is cancer? No, risky.
-                # Let's assume binary logic if we trained mapped classes.
-                pass
-                
-            return probs[0] # Fallback
+        # A single row is cheapest without joblib dispatch
+        return float(self.predict_batch([image], n_jobs=1)[0])
+
+    def predict_batch(self, images, chunk_size=PREDICT_CHUNK_SIZE, n_jobs=PREDICT_N_JOBS):
+        """
+        Predicts P(cancer) for many images, returning a float array.
+        images may be an (N, H, W[, 3]) array, a list of arrays, a directory
+        (scanned in list_images order) or an iterable of image paths.
+        Each chunk is preprocessed into one array and scored with a single
+        predict_proba call; n_jobs sets decode threads and forest parallelism.
+        """
+        if not self.loaded:
+            self.load()
         else:
+            self.maybe_reload()
+        workers = os.cpu_count() if n_jobs is None or n_jobs < 0 else n_jobs
+        if workers <= 1:
+            return self._score_chunks(_iter_chunks(images, chunk_size, map), n_jobs)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return self._score_chunks(_iter_chunks(images, chunk_size, pool.map), n_jobs)
+
+    def _score_chunks(self, chunks, n_jobs):
+        scores = [self._score(chunk, n_jobs) for chunk in chunks]
+        if not scores:
+            return np.empty(0)
+        return np.concatenate(scores)
+
+    def _score(self, chunk, n_jobs=PREDICT_N_JOBS):
+        # One read of the active tuple, so a concurrent reload can't mix models
+        model, features, normal_idx = self._active
+        if not model:
             # Fallback heuristic
-            return 0.5
+            return np.full(len(chunk), 0.5)
+
+        if not isinstance(model, CompiledForest) and model.n_jobs != n_jobs:
+            # Legacy sklearn estimator: the loaded model is shared by every
+            # calling thread, so set parallelism on a per-call shallow copy
+            model = copy.copy(model)
+            model.n_jobs = n_jobs
+        probs = model.predict_proba(features.transform(chunk))
+
+        # We want P(Cancer) = 1 - P(Normal)
+        if normal_idx != -1:
+            return 1.0 - probs[:, normal_idx]
+        return probs[:, 0] # Fallback
+
+def _resolve_normal_index(model):
+    # Classes are sorted alphabetically:
+    # 0: adenocarcinoma, 1: large.cell, 2: normal, 3: squamous
+    # Synthetic datasets use 'healthy' instead of 'normal'.
+    for i, c in enumerate(model.classes_):
+        if 'normal' in c or 'healthy' in c:
+            return i
+    return -1
+
+def preprocess_image(image):
+    """Resizes to IMG_SIZE and promotes grayscale to 3 channels, as in training."""
+    img = cv2.resize(image, (IMG_SIZE, IMG_SIZE))
+    if len(img.shape) == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+def list_images(directory):
+    """Image files under directory (recursive), in sorted order."""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        paths.extend(os.path.join(root, f) for f in sorted(files) if not f.startswith('.'))
+    return paths
 
-def load_data():
+def _load_image(path):
+    img = decode_image(path)
+    if img is None:
+        raise ValueError(f"Could not read image: {path}")
+    return img
+
+def _iter_chunks(images, chunk_size, map_fn):
+    """Yields preprocessed uint8 (k, IMG_SIZE, IMG_SIZE, 3) chunks of the input."""
+    if isinstance(images, np.ndarray) and images.ndim == 4 and images.shape[1:] == (IMG_SIZE, IMG_SIZE, 3):
+        # Already a preprocessed stack: slice without copying
+        for start in range(0, len(images), chunk_size):
+            yield images[start:start + chunk_size]
+        return
+
+    if isinstance(images, (str, os.PathLike)):
+        images = list_images(images)
+    it = iter(images)
+    while True:
+        batch = list(islice(it, chunk_size))
+        if not batch:
+            return
+        out = np.empty((len(batch), IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+        if isinstance(batch[0], (str, os.PathLike)):
+            loaded = map_fn(_load_image, batch)
+        else:
+            loaded = map_fn(preprocess_image, batch)
+        for i, img in enumerate(loaded):
+            out[i] = img
+        yield out
+
+def load_data(return_entries=False):
+    """
+    Returns (images, labels) with images as a uint8 (N, IMG_SIZE, IMG_SIZE, 3) array,
+    memory-mapped from the decoded-image cache (see src/dataset.py).
+    With return_entries=True, also the per-row file entries (path, label, mtime, size).
+    """
     print("Loading dataset from disk...")
-    X = []
-    y = []
     
     # We will load 'train' and 'test' folders as one big dataset for splitting, 
     # or just use train for training.
     train_dir = os.path.join(DATA_DIR, 'train')
     
-    classes = sorted(os.listdir(train_dir))
-    # Filter out hidden files
-    classes = [c for c in classes if not c.startswith('.')]
-    
-    print(f"Found classes: {classes}")
-    
-    for label in classes:
-        folder_path = os.path.join(train_dir, label)
-        if not os.path.isdir(folder_path): continue
-        
-        for file in os.listdir(folder_path):
-            if file.startswith('.'): continue
-            
-            img_path = os.path.join(folder_path, file)
-            img = cv2.imread(img_path)
-            if img is not None:
-                img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
-                X.append(img.flatten())
-                y.append(label)
-                
-    return np.array(X), np.array(y)
-
-def train_model():
+    X, y, entries = load_dataset(train_dir)
+    print(f"Found classes: {sorted(set(y))}")
+    if return_entries:
+        return X, y, entries
+    return X, y
+
+def training_manifest(entries):
+    """{path: (mtime_ns, size)} of the files a model was trained on."""
+    return {e["path"]: (e["mtime_ns"], e["size"]) for e in entries}
+
+def row_features(features, X, entries, cache_dir=FEATURE_CACHE_DIR):
+    """
+    features.transform(X) for a fitted pipeline, transforming only rows it
+    hasn't seen. Rows are cached in a memmapped .npy per pipeline (keyed by
+    a hash of the pickled pipeline) alongside their (path, mtime_ns, size),
+    so new or changed files are transformed and the rest are copied over.
+    """
+    key = hashlib.blake2b(pickle.dumps(features), digest_size=8).hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"rows-{features.name}-{key}.npy")
+    keys_path = path.replace(".npy", ".keys.json")
+    row_keys = [[e["path"], e["mtime_ns"], e["size"]] for e in entries]
+
+    F_old, hits = None, np.full(len(row_keys), -1, dtype=np.int64)
+    if os.path.exists(path) and os.path.exists(keys_path):
+        with open(keys_path) as f:
+            old_index = {tuple(k): i for i, k in enumerate(json.load(f))}
+        F_old = np.load(path, mmap_mode="r")
+        hits = np.array([old_index.get(tuple(k), -1) for k in row_keys], dtype=np.int64)
+        if len(F_old) == len(row_keys) and np.array_equal(hits, np.arange(len(row_keys))):
+            return F_old
+
+    missing = np.flatnonzero(hits < 0)
+    cached = np.flatnonzero(hits >= 0)
+    print(f"Transforming {len(missing)} new rows ({len(cached)} cached)...")
+    F_new = features.transform(X[missing]) if len(missing) else None
+    reference = F_new if F_new is not None else F_old
+    out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=reference.dtype,
+                                    shape=(len(row_keys),) + reference.shape[1:])
+    if len(cached):
+        out[cached] = F_old[hits[cached]]
+    if F_new is not None:
+        out[missing] = F_new
+    out.flush()
+    del out, F_old
+    os.replace(path + ".tmp", path)
+    with open(keys_path + ".tmp", 'w') as f:
+        json.dump(row_keys, f)
+    os.replace(keys_path + ".tmp", keys_path)
+    return np.load(path, mmap_mode="r")
+
+def estimator_path(path=RF_MODEL_PATH):
+    """Sidecar file holding the sklearn estimator (for retraining, not inference)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.estimator{ext}"
+
+def _atomic_dump(obj, path):
+    import joblib
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+def holdout_split(entries, manifest=None, holdout=None, test_size=0.2):
+    """
+    (train_idx, test_idx) rows of entries. Without a previous holdout this is
+    train_model's random split. Otherwise files in holdout stay held out,
+    files in the previous manifest stay in training and new files are
+    assigned by a hash of their path, so no file ever moves between splits.
+    """
+    if holdout is None:
+        from sklearn.model_selection import train_test_split
+        return train_test_split(np.arange(len(entries)), test_size=test_size, random_state=42)
+    holdout = set(holdout)
+    manifest = manifest or {}
+    test = np.zeros(len(entries), dtype=bool)
+    for i, e in enumerate(entries):
+        if e["path"] in holdout:
+            test[i] = True
+        elif e["path"] not in manifest:
+            h = int.from_bytes(hashlib.blake2b(e["path"].encode(), digest_size=8).digest(), "big")
+            test[i] = h / 2**64 < test_size
+    return np.flatnonzero(~test), np.flatnonzero(test)
+
+def update_seed(updates, base=42):
+    """random_state for the trees grown by the updates-th incremental update."""
+    return int(np.random.SeedSequence([base, updates]).generate_state(1)[0] >> 1)
+
+def grow_trees(clf, F, y, n_trees, seed, replace_oldest=False):
+    """
+    Adds n_trees trees to a forest (warm_start), optionally dropping
+    as many of the oldest. Warm start derives the new trees' seeds from
+    random_state and the current tree count, which stays the same when trees
+    are replaced, so each call needs its own seed or it regrows the trees
+    of the previous call.
+    """
+    clf.warm_start = True
+    clf.random_state = seed
+    clf.n_estimators = len(getattr(clf, "estimators_", ())) + n_trees
+    clf.fit(F, y)
+    if replace_oldest:
+        clf.estimators_ = clf.estimators_[n_trees:]
+        clf.n_estimators = len(clf.estimators_)
+    return clf
+
+def save_model(clf, features, path=RF_MODEL_PATH, check_X=None, manifest=None, holdout=None, updates=0):
+    """
+    Compiles the forest to flat node arrays and saves it with its fitted
+    feature pipeline as an uncompressed joblib artifact (required for
+    memory-mapped loading). The sklearn estimator goes to estimator_path(path).
+    check_X (feature rows) verifies compiled/sklearn predict_proba parity first.
+    manifest (see training_manifest) lets update_model find new files later;
+    holdout (test file paths) and updates (incremental update count) let it
+    keep the same held-out files and draw fresh tree seeds.
+
+    Both files are written to a temp name and renamed into place, so a running
+    CellClassifier never sees a partial artifact; the estimator goes first so
+    the artifact never refers to a stale one.
+    """
+    forest = CompiledForest.from_sklearn(clf, check_X=check_X)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _atomic_dump(clf, estimator_path(path))
+    _atomic_dump({"model": forest, "features": features, "manifest": manifest,
+                  "holdout": holdout, "updates": updates}, path)
+
+def train_model(feature_pipeline=FEATURE_PIPELINE, search=False, target_accuracy=None):
+    """
+    Trains and saves the classifier. With search=True, configs are first
+    cross-validated on cached features of the training split (src/search.py)
+    and the fastest one meeting target_accuracy (else the most accurate) is
+    used; the test split stays unseen until the final evaluation.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, classification_report
     print("Initializing Random Forest Classifier...")
     
-    X, y = load_data()
+    X, y, entries = load_data(return_entries=True)
     print(f"Loaded {len(X)} images.")
     
     # Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    train_idx, test_idx = holdout_split(entries)
+    y_train, y_test = y[train_idx], y[test_idx]
+    
+    # Features (fitted on the training split only). All rows are transformed
+    # through the row cache so update_model only has to transform new files.
+    features = build_pipeline(feature_pipeline)
+    print(f"Extracting features ({features.name})...")
+    features.fit(X[train_idx])
+    F = row_features(features, X, entries)
+    F_train, F_test = np.asarray(F[train_idx]), np.asarray(F[test_idx])
+    print(f"Feature dimension: {F_train.shape[1]}")
+    
+    params = {"n_estimators": 100}
+    if search:
+        from src.search import search_models, select_model
+        params = select_model(search_models(feature_pipeline=feature_pipeline, rows=train_idx), target_accuracy)["params"]
+        print(f"Selected config: {params}")
     
     # Train
-    clf = RandomForestClassifier(n_estimators=100, n_jobs=-1, random_state=42)
+    clf = RandomForestClassifier(n_jobs=-1, random_state=42, **params)
     print("Training...")
-    clf.fit(X_train, y_train)
+    clf.fit(F_train, y_train)
     
     # Evaluate
-    preds = clf.predict(X_test)
+    preds = clf.predict(F_test)
     acc = accuracy_score(y_test, preds)
     print(f"Model Accuracy: {acc*100:.2f}%")
     print(classification_report(y_test, preds))
     
     # Save
     print(f"Saving model to {RF_MODEL_PATH}...")
-    os.makedirs(os.path.dirname(RF_MODEL_PATH), exist_ok=True)
-    with open(RF_MODEL_PATH, 'wb') as f:
-        pickle.dump(clf, f)
+    save_model(clf, features, check_X=F_test, manifest=training_manifest(entries),
+               holdout=[entries[i]["path"] for i in test_idx])
     print("Training complete.")
 
+def update_model(trees_per_update=INCREMENTAL_TREES, replace_oldest=False, path=RF_MODEL_PATH):
+    """
+    Incrementally retrains after images are added to (or changed in) the
+    training set. Only new files are decoded (src/dataset.py cache) and
+    transformed (row_features), and the saved feature pipeline is reused,
+    so existing trees stay valid; the forest then grows trees_per_update new
+    trees, with a seed of their own, on the current training split
+    (warm_start). With replace_oldest=True the same number of oldest trees
+    is dropped, keeping the forest (and predict latency) constant in size.
+    Files held out by train_model stay held out (see holdout_split) and
+    accuracy is reported on them.
+
+    The result is published atomically by save_model, so servers pick it up
+    on their next reload check. Falls back to train_model when there is no
+    usable previous model or the class set changed.
+    """
+    import joblib
+    from sklearn.metrics import accuracy_score
+
+    artifact = joblib.load(path) if os.path.exists(path) else None
+    if not isinstance(artifact, dict) or not artifact.get("manifest") or not os.path.exists(estimator_path(path)):
+        print("No incremental state for the current model, retraining from scratch.")
+        return train_model()
+
+    X, y, entries = load_data(return_entries=True)
+    old = artifact["manifest"]
+    new_rows = np.array([i for i, e in enumerate(entries) if tuple(old.get(e["path"], ())) != (e["mtime_ns"], e["size"])],
+                        dtype=np.int64)
+    if not len(new_rows):
+        print("Model is up to date.")
+        return None
+
+    train_idx, test_idx = holdout_split(entries, old, artifact.get("holdout"))
+    clf = joblib.load(estimator_path(path))
+    if set(y[train_idx]) != set(clf.classes_):
+        print("Class set changed, retraining from scratch.")
+        return train_model()
+
+    print(f"Updating model with {len(new_rows)} new images...")
+    features = artifact["features"]
+    F = row_features(features, X, entries)
+    F_test, y_test = np.asarray(F[test_idx]), y[test_idx]
+    print(f"Held-out accuracy before update: {accuracy_score(y_test, clf.predict(F_test))*100:.2f}%")
+
+    updates = artifact.get("updates", 0) + 1
+    clf.n_jobs = -1
+    grow_trees(clf, np.asarray(F[train_idx]), y[train_idx], trees_per_update, update_seed(updates), replace_oldest)
+    print(f"Held-out accuracy after update: {accuracy_score(y_test, clf.predict(F_test))*100:.2f}%"
+          f" ({clf.n_estimators} trees)")
+
+    print(f"Saving model to {path}...")
+    save_model(clf, features, path, check_X=F_test, manifest=training_manifest(entries),
+               holdout=[entries[i]["path"] for i in test_idx], updates=updates)
+    return clf
+
+def train_model_streaming(batches, validation=None, feature_pipeline=FEATURE_PIPELINE, trees_per_batch=4,
+                          max_trees=STREAM_MAX_TREES, min_batch_size=STREAM_MIN_BATCH, classes=None, seed=0,
+                          path=RF_MODEL_PATH):
+    """
+    Trains from an iterator of in-memory (images, labels) batches, e.g.
+    src.data_generator.stream_synthetic, without writing PNGs. The feature
+    pipeline is fitted on the first batch; every batch then grows
+    trees_per_batch new trees (warm_start). classes defaults to the labels
+    of the first batch.
+
+    One batch is held back so that a batch smaller than min_batch_size or
+    missing one of the classes (e.g. the tail of the stream) is merged into
+    the one before it instead of being fitted alone. At most min_batch_size
+    rows are merged into a held batch, so memory stays at about two batches;
+    only a held batch that is itself missing a class keeps absorbing batches
+    until it has them all. Leftover rows at the end of the stream that still
+    miss a class are dropped. The forest never exceeds max_trees trees: once
+    the budget is full, later batches replace a random batch's trees with
+    reservoir sampling, so the kept trees are a uniform sample over the
+    stream and model size and predict latency stay bounded however many
+    samples arrive. Each batch's trees get their own seed (update_seed).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score
+
+    features = build_pipeline(feature_pipeline)
+    clf = RandomForestClassifier(n_estimators=0, warm_start=True, n_jobs=-1, random_state=42)
+    rng = np.random.default_rng(seed)
+    slots = max(max_trees // trees_per_batch, 1)
+    kept = [] # Trees of each batch in the reservoir
+    fitted = 0
+
+    def fit(images, labels):
+        nonlocal fitted
+        fitted += 1
+        if fitted > slots:
+            slot = rng.integers(fitted)
+            if slot >= slots:
+                return # Not sampled: skip the batch entirely
+        # Warm start would reuse seeds once replacement keeps the tree count fixed
+        grow_trees(clf, features.transform(images), labels, trees_per_batch, update_seed(fitted, base=seed))
+        new_trees = clf.estimators_[-trees_per_batch:]
+        if fitted <= slots:
+            kept.append(new_trees)
+        else:
+            kept[slot] = new_trees
+            clf.estimators_ = [tree for trees in kept for tree in trees]
+            clf.n_estimators = len(clf.estimators_)
+
+    def has_all(labels):
+        return len(np.unique(labels)) == len(classes)
+
+    held, merged = None, 0 # merged: rows merged into a held batch that has every class
+    seen = 0
+    for i, (images, labels) in enumerate(batches):
+        seen += len(images)
+        if i == 0:
+            features.fit(images)
+            classes = np.unique(labels) if classes is None else np.asarray(classes)
+        if not np.isin(labels, classes).all():
+            raise ValueError(f"Batch {i + 1} has labels outside {classes.tolist()}")
+
+        if held is not None and has_all(held[1]):
+            complete = len(images) >= min_batch_size and has_all(labels)
+            if complete or merged + len(images) > min_batch_size:
+                fit(*held)
+                held = None
+            else:
+                merged += len(images)
+        if held is None:
+            held, merged = (images, labels), 0
+        else:
+            held = (np.concatenate([held[0], images]), np.concatenate([held[1], labels]))
+        print(f"  batch {i + 1}: {seen} samples, {sum(len(trees) for trees in kept)} trees")
+    if held is None:
+        raise ValueError("Training stream was empty")
+    if has_all(held[1]):
+        fit(*held)
+    elif fitted:
+        print(f"Dropping the last {len(held[1])} samples: they don't contain every class")
+    else:
+        raise ValueError(f"Training stream never contained every class of {classes.tolist()} together")
+
+    F_val = None
+    if validation is not None:
+        X_val, y_val = validation
+        F_val = features.transform(X_val)
+        acc = accuracy_score(y_val, clf.predict(F_val))
+        print(f"Model Accuracy: {acc*100:.2f}%")
+
+    print(f"Saving model to {path}...")
+    save_model(clf, features, path, check_X=F_val)
+    return clf, features
+
 if __name__ == "__main__":
-    train_model()
+    if "--update" in sys.argv[1:]:
+        update_model()
+    else:
+        train_model()
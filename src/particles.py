@@ -0,0 +1,59 @@
+import numpy as np
+from matplotlib.colors import to_rgba_array
+
+class ParticlePool:
+    """
+    Fixed-capacity particle storage for the renderers' effects.
+    Live particles occupy the first `count` rows of preallocated arrays
+    (position, velocity, remaining life, palette index), so a step is a
+    handful of vectorized ops: age, integrate, then compact out the expired
+    rows. Emission is batched (many origins, many particles each) and
+    anything past capacity is dropped instead of growing the pool.
+    """
+    def __init__(self, capacity=4096, palette=('#00ff41', '#fdf500')):
+        self.capacity = capacity
+        self.palette = to_rgba_array(palette)
+        self.pos = np.zeros((capacity, 3))
+        self.vel = np.zeros((capacity, 3))
+        self.life = np.zeros(capacity, dtype=np.int32)
+        self.color = np.zeros(capacity, dtype=np.int16)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def emit(self, origins, per_origin, life, color, speed, rng=np.random):
+        """Spawns per_origin particles at each (x, y, z) in origins with velocities in [-speed, speed]."""
+        origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+        n = min(len(origins) * per_origin, self.capacity - self.count)
+        if n <= 0:
+            return 0
+        s = slice(self.count, self.count + n)
+        self.pos[s] = np.repeat(origins, per_origin, axis=0)[:n]
+        self.vel[s] = rng.uniform(-speed, speed, (n, 3))
+        self.life[s] = life
+        self.color[s] = color
+        self.count += n
+        return n
+
+    def step(self):
+        """Ages and moves every particle, then drops the expired ones."""
+        n = self.count
+        self.life[:n] -= 1
+        self.pos[:n] += self.vel[:n]
+        alive = self.life[:n] > 0
+        k = int(np.count_nonzero(alive))
+        if k < n:
+            for arr in (self.pos, self.vel, self.life, self.color):
+                arr[:k] = arr[:n][alive]
+            self.count = k
+
+    def positions(self):
+        return self.pos[:self.count]
+
+    def colors(self):
+        return self.palette[self.color[:self.count]]
+
+    def sizes(self, scale=5):
+        # Fade out size
+        return self.life[:self.count] * scale
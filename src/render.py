@@ -0,0 +1,136 @@
+import argparse
+import glob
+import math
+import os
+import pickle
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.config import RENDER_DIR, RENDER_WORKERS, RENDER_DPI, RENDER_FPS
+from src.runner import take_snapshot
+
+# Headless offline renderer.
+# A run is recorded as one Snapshot per tick (src/runner.py), then frame
+# ranges are rendered in parallel with the Agg backend using the same
+# Visualization scene as the desktop window. Each worker replays the frames
+# just before its shard without drawing them, so the analytics history and
+# particle effects match a sequential render; effect randomness is seeded
+# per frame for the same reason.
+
+WARMUP_FRAMES = 100 # Analytics window; also covers the longest particle life
+
+def record_run(model, ticks):
+    """Steps model ticks times and returns one snapshot per tick."""
+    snapshots = []
+    for tick in range(1, ticks + 1):
+        model.step()
+        snapshots.append(take_snapshot(model, tick))
+    return snapshots
+
+def save_recording(snapshots, space_dims, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump({"space_dims": tuple(space_dims), "snapshots": snapshots}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_recording(path):
+    """Returns (space_dims, snapshots)."""
+    with open(path, 'rb') as f:
+        recording = pickle.load(f)
+    return recording["space_dims"], recording["snapshots"]
+
+def _render_shard(task):
+    """Renders frames [start, end) of a recording to PNGs. Runs in a worker process."""
+    recording_path, start, end, out_dir, dpi, seed = task
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from src.visualization import Visualization
+
+    space_dims, snapshots = load_recording(recording_path)
+    viz = Visualization(None, blit=False, decoupled=False, space_dims=space_dims)
+    viz.show_rates = False
+    for frame in range(max(0, start - WARMUP_FRAMES), end):
+        viz.rng = np.random.default_rng([seed, frame])
+        snap = snapshots[frame]
+        viz.draw_snapshot(snap, frame, snap.neutralized)
+        if frame >= start:
+            viz.fig.savefig(os.path.join(out_dir, f"frame_{frame:06d}.png"), dpi=dpi,
+                            facecolor=viz.fig.get_facecolor())
+    plt.close(viz.fig)
+    return end - start
+
+def encode_video(frames_dir, path, fps=RENDER_FPS):
+    """Encodes frame_%06d.png with ffmpeg. Returns False if ffmpeg isn't installed."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return False
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-framerate", str(fps),
+                    "-i", os.path.join(frames_dir, "frame_%06d.png"),
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p", path], check=True)
+    return True
+
+def render_run(source, out_dir=RENDER_DIR, ticks=None, workers=RENDER_WORKERS, dpi=RENDER_DPI,
+               video=None, fps=RENDER_FPS, seed=0):
+    """
+    Renders a run to out_dir/frame_%06d.png (replacing any frames already
+    there) and optionally encodes video.
+    source is a recording path or a live model (stepped for `ticks` ticks
+    and saved to out_dir/recording.pkl first). Returns the frame count.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # Frames left by an earlier (longer) render would be picked up by the encoder
+    for stale in glob.glob(os.path.join(out_dir, "frame_*.png")):
+        os.remove(stale)
+    if isinstance(source, (str, os.PathLike)):
+        recording_path = source
+        _, snapshots = load_recording(recording_path)
+    else:
+        start = time.perf_counter()
+        snapshots = record_run(source, ticks)
+        recording_path = os.path.join(out_dir, "recording.pkl")
+        save_recording(snapshots, source.space_dims, recording_path)
+        print(f"Recorded {len(snapshots)} ticks in {time.perf_counter() - start:.1f}s")
+
+    n = len(snapshots) if ticks is None else min(ticks, len(snapshots))
+    workers = workers or os.cpu_count()
+    # Several shards per worker for load balancing; each pays WARMUP_FRAMES of replay
+    shard = max(WARMUP_FRAMES, math.ceil(n / (workers * 4)))
+    tasks = [(recording_path, s, min(s + shard, n), out_dir, dpi, seed) for s in range(0, n, shard)]
+
+    start = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for count in pool.map(_render_shard, tasks):
+            done += count
+            print(f"  {done}/{n} frames")
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {n} frames in {elapsed:.1f}s ({n / elapsed:.1f} frames/s, {workers} workers)")
+
+    if video:
+        if encode_video(out_dir, video, fps):
+            print(f"Video written to {video}")
+        else:
+            print(f"ffmpeg not found; frames left in {out_dir}")
+    return n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a simulation run to PNG frames / video without a display.")
+    parser.add_argument("--recording", help="Recorded run to render (default: simulate a new one)")
+    parser.add_argument("--ticks", type=int, help="Ticks to simulate (default 1000) / frames to render (default all)")
+    parser.add_argument("--out", default=RENDER_DIR)
+    parser.add_argument("--video", help="Output video path, e.g. renders/run.mp4 (needs ffmpeg)")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--dpi", type=int, default=RENDER_DPI)
+    parser.add_argument("--fps", type=int, default=RENDER_FPS)
+    args = parser.parse_args()
+
+    if args.recording:
+        source = args.recording
+    else:
+        from src.environment import Bloodstream
+        source = Bloodstream()
+        args.ticks = args.ticks or 1000
+    render_run(source, out_dir=args.out, ticks=args.ticks, workers=args.workers, dpi=args.dpi,
+               video=args.video, fps=args.fps)
@@ -0,0 +1,59 @@
+import numpy as np
+
+class StationField:
+    """
+    Precomputed nearest-RechargeStation lookup over the simulation volume.
+    space_dims is split into cubic voxels of `voxel` units; every voxel stores
+    the index of the station nearest its centre, so a low-battery bot finds
+    its station with one array read instead of scanning agents_list, and
+    next_step gives its move towards that station.
+
+    Built once per station layout (Bloodstream rebuilds it lazily after a
+    station is added, moved or removed); build cost is O(voxels x stations),
+    done in chunks so thousands of stations stay cheap in memory.
+    """
+    def __init__(self, space_dims, stations, voxel=2, chunk_size=4096):
+        self.space_dims = tuple(space_dims)
+        self.voxel = voxel
+        self.stations = list(stations)
+        self.shape = tuple(int(np.ceil(d / voxel)) for d in self.space_dims)
+        self.nearest_index = np.full(self.shape, -1, dtype=np.int32)
+        if not self.stations:
+            return
+
+        station_pos = np.array([s.pos for s in self.stations], dtype=float)
+        station_sq = (station_pos ** 2).sum(axis=1)
+        centres = (np.indices(self.shape).reshape(3, -1).T + 0.5) * voxel
+        flat = self.nearest_index.reshape(-1)
+        for start in range(0, len(centres), chunk_size):
+            # |c - s|^2 minus the per-row constant |c|^2, as one matmul
+            d2 = station_sq - 2.0 * centres[start:start + chunk_size] @ station_pos.T
+            flat[start:start + chunk_size] = d2.argmin(axis=1)
+
+    def _voxel(self, pos):
+        return tuple(min(max(int(p // self.voxel), 0), n - 1) for p, n in zip(pos, self.shape))
+
+    def nearest(self, pos):
+        """Nearest station to pos (to voxel resolution), or None if there are none."""
+        i = self.nearest_index[self._voxel(pos)]
+        return self.stations[i] if i >= 0 else None
+
+    def nearest_many(self, positions):
+        """Vectorized lookup: station indices (into self.stations) for an (n, 3) array."""
+        idx = np.clip((np.asarray(positions) // self.voxel).astype(np.int64), 0, np.array(self.shape) - 1)
+        return self.nearest_index[idx[:, 0], idx[:, 1], idx[:, 2]]
+
+    def next_step(self, pos):
+        """
+        (station, (dx, dy, dz)): the station nearest pos and one move towards
+        it, a unit sign step or the exact remainder once within one unit on
+        every axis. (None, (0, 0, 0)) when there are no stations.
+        """
+        station = self.nearest(pos)
+        if station is None:
+            return None, (0, 0, 0)
+        (x, y, z), (sx, sy, sz) = pos, station.pos
+        dx, dy, dz = sx - x, sy - y, sz - z
+        if -1 <= dx <= 1 and -1 <= dy <= 1 and -1 <= dz <= 1:
+            return station, (dx, dy, dz)
+        return station, ((dx > 0) - (dx < 0), (dy > 0) - (dy < 0), (dz > 0) - (dz < 0))
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+import numpy as np
+from src.agents import Cell, NanoBot
+
+# Background simulation stepping for the renderers.
+# The model is only touched from the runner thread; the renderer reads the
+# latest published Snapshot (an immutable set of NumPy arrays swapped in with
+# one assignment) and UI commands are queued and applied between ticks.
+
+class Snapshot:
+    """Render-ready copy of the model state after one tick."""
+    archived_healthy = 0 # Default for recordings made before compaction existed
+
+    def __init__(self, tick, cell_pos, cell_cancer, cell_repairing, bot_pos, bot_state, lasers, neutralized,
+                 archived_healthy=0):
+        self.tick = tick
+        self.cell_pos = cell_pos # (n, 3) float
+        self.cell_cancer = cell_cancer # (n,) bool
+        self.cell_repairing = cell_repairing # (n,) bool
+        self.bot_pos = bot_pos # (m, 3) float
+        self.bot_state = bot_state # (m,) str
+        self.lasers = lasers # (k, 2, 3) bot -> target segments
+        self.neutralized = neutralized # (j, 3) cells neutralized this tick
+        self.archived_healthy = archived_healthy # Neutralized cells already despawned
+
+    @property
+    def healthy_count(self):
+        return int(len(self.cell_cancer) - self.cell_cancer.sum()) + self.archived_healthy
+
+    @property
+    def cancer_count(self):
+        return int(self.cell_cancer.sum())
+
+    @property
+    def active_bots(self):
+        return int(np.count_nonzero(self.bot_state != "IDLE"))
+
+def _points(positions):
+    return np.asarray(positions, dtype=float).reshape(-1, 3)
+
+def take_snapshot(model, tick):
+    """Copies the state the renderers need; consumes the cells' just_neutralized flags."""
+    cells = [a for a in model.agents_list if isinstance(a, Cell)]
+    bots = [a for a in model.agents_list if isinstance(a, NanoBot)]
+
+    neutralized = []
+    for c in cells:
+        if c.just_neutralized:
+            neutralized.append(c.pos)
+            c.just_neutralized = False
+
+    lasers = [(b.pos, b.target_cell.pos) for b in bots if b.state != "IDLE" and b.target_cell]
+    return Snapshot(
+        tick=tick,
+        cell_pos=_points([c.pos for c in cells]),
+        cell_cancer=np.array([c.is_cancer for c in cells], dtype=bool),
+        cell_repairing=np.array([c.being_repaired for c in cells], dtype=bool),
+        bot_pos=_points([b.pos for b in bots]),
+        bot_state=np.array([b.state for b in bots], dtype=str),
+        lasers=np.asarray(lasers, dtype=float).reshape(-1, 2, 3),
+        neutralized=_points(neutralized),
+        archived_healthy=model.archived_healthy,
+    )
+
+class SimulationRunner:
+    """
+    Steps a Bloodstream on a background thread at tick_rate ticks/s (None or
+    0 = as fast as possible) and publishes a Snapshot after every tick.
+    Readers take `latest` whenever they are ready and never block the
+    simulation; ticks in between are simply not drawn. Neutralization events
+    are also queued separately so effects aren't lost with dropped snapshots.
+    """
+    def __init__(self, model, tick_rate=None):
+        self.model = model
+        self.tick_rate = tick_rate
+        self.tick = 0
+        self.tick_rate_achieved = 0.0 # Exponential moving average, ticks/s
+        self.latest = take_snapshot(model, 0)
+        self._events = queue.SimpleQueue()
+        self._commands = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def call(self, fn, *args):
+        """Runs fn(*args) on the simulation thread before the next tick."""
+        self._commands.put((fn, args))
+
+    def drain_events(self):
+        """Positions of every cell neutralized since the last call, (n, 3)."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        return np.concatenate(events) if events else _points([])
+
+    def _run(self):
+        period = 1.0 / self.tick_rate if self.tick_rate else 0.0
+        next_tick = last = time.perf_counter()
+        while not self._stop.is_set():
+            while True:
+                try:
+                    fn, args = self._commands.get_nowait()
+                except queue.Empty:
+                    break
+                fn(*args)
+
+            self.model.step()
+            self.tick += 1
+            snap = take_snapshot(self.model, self.tick)
+            if len(snap.neutralized):
+                self._events.put(snap.neutralized)
+            self.latest = snap
+
+            now = time.perf_counter()
+            dt = max(now - last, 1e-6)
+            last = now
+            self.tick_rate_achieved = 1.0 / dt if not self.tick_rate_achieved else 0.9 * self.tick_rate_achieved + 0.1 / dt
+
+            if period:
+                next_tick = max(next_tick + period, now - period) # Don't burst to catch up after a stall
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    self._stop.wait(delay)
+            else:
+                time.sleep(0) # Let the render thread take the GIL
@@ -0,0 +1,175 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.config import DATA_DIR, IMG_SIZE, FEATURE_PIPELINE, FEATURE_CACHE_DIR, SEARCH_CV_FOLDS, SEARCH_WORKERS
+from src.dataset import load_dataset
+from src.features import build_pipeline
+from src.forest import CompiledForest
+
+# Hyperparameter search for train_model.
+# Features are extracted once into a memmapped .npy keyed by the dataset
+# manifest, the rows searched over and the pipeline; workers open it by
+# path, so no data is pickled. train_model searches its training split only,
+# so the held-out accuracy it reports stays unbiased by model selection.
+# Configs are cross-validated fold by fold. Once min_folds (default 2) folds
+# have run, after every fold a config is dropped, before more folds are spent
+# on it, when its mean + std accuracy over the folds so far falls below the
+# leader's mean - std - prune_margin.
+
+DEFAULT_GRID = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [None, 10, 20],
+    "max_features": ["sqrt", 0.05],
+    "min_samples_leaf": [1, 3],
+}
+
+def grid_configs(grid=DEFAULT_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def random_configs(n, grid=DEFAULT_GRID, seed=0):
+    configs = grid_configs(grid)
+    return random.Random(seed).sample(configs, min(n, len(configs)))
+
+def cached_features(feature_pipeline=FEATURE_PIPELINE, cache_dir=FEATURE_CACHE_DIR, rows=None):
+    """
+    Returns (features_path, labels, fitted_pipeline) for the dataset rows
+    (default all), extracting only on a cache miss. The pipeline is fitted on
+    those rows alone.
+    """
+    X, y, entries = load_dataset(os.path.join(DATA_DIR, 'train'))
+    if rows is not None:
+        rows = np.asarray(rows)
+        X, y, entries = X[rows], y[rows], [entries[i] for i in rows]
+    manifest = json.dumps([[e["path"], e["mtime_ns"], e["size"]] for e in entries] + [feature_pipeline, IMG_SIZE])
+    key = hashlib.blake2b(manifest.encode(), digest_size=8).hexdigest()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{feature_pipeline}-{key}.npy")
+    pipeline_path = path.replace(".npy", ".pipeline.pkl")
+    if os.path.exists(path) and os.path.exists(pipeline_path):
+        with open(pipeline_path, 'rb') as f:
+            features = pickle.load(f)
+        return path, y, features
+
+    print(f"Extracting features ({feature_pipeline}) into {path}...")
+    features = build_pipeline(feature_pipeline).fit(X)
+    F = features.transform(X)
+    out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.float32, shape=F.shape)
+    out[:] = F
+    out.flush()
+    del out
+    os.replace(path + ".tmp", path)
+    with open(pipeline_path, 'wb') as f:
+        pickle.dump(features, f)
+    return path, y, features
+
+def _evaluate(task):
+    """Fits one config on one fold. Runs in a worker process."""
+    from sklearn.ensemble import RandomForestClassifier
+    features_path, y, train_idx, test_idx, params = task
+    F = np.load(features_path, mmap_mode="r")
+
+    start = time.perf_counter()
+    clf = RandomForestClassifier(n_jobs=1, random_state=42, **params)
+    clf.fit(F[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    F_test = np.asarray(F[test_idx])
+    acc = float(np.mean(clf.predict(F_test) == y[test_idx]))
+
+    forest = CompiledForest.from_sklearn(clf)
+    size = forest.feature.nbytes + forest.threshold.nbytes + forest.children.nbytes + forest.value.nbytes
+    row = F_test[:1]
+    times = []
+    for _ in range(20):
+        t = time.perf_counter()
+        forest.predict_proba(row)
+        times.append(time.perf_counter() - t)
+    return acc, fit_s, size, float(np.median(times))
+
+def search_models(configs=None, feature_pipeline=FEATURE_PIPELINE, folds=SEARCH_CV_FOLDS,
+                  workers=SEARCH_WORKERS, prune_margin=0.0, min_folds=2, rows=None, seed=42):
+    """
+    Cross-validates every config on the dataset rows (default all) and
+    returns one result dict per config: params, mean/std accuracy over the
+    folds it ran, fit seconds, model bytes, single-row predict latency
+    (compiled forest) and whether it was pruned. Nothing is pruned before
+    min_folds folds have run.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    configs = configs if configs is not None else grid_configs()
+    features_path, y, _ = cached_features(feature_pipeline, rows=rows)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y))
+
+    results = [{"params": p, "scores": [], "fit_s": [], "size": [], "latency": [], "pruned": False} for p in configs]
+    alive = list(range(len(configs)))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fold, (train_idx, test_idx) in enumerate(splits):
+            tasks = [(features_path, y, train_idx, test_idx, configs[i]) for i in alive]
+            for i, (acc, fit_s, size, latency) in zip(alive, pool.map(_evaluate, tasks)):
+                r = results[i]
+                r["scores"].append(acc)
+                r["fit_s"].append(fit_s)
+                r["size"].append(size)
+                r["latency"].append(latency)
+
+            survivors = alive
+            if fold + 1 >= min_folds:
+                mean = {i: np.mean(results[i]["scores"]) for i in alive}
+                std = {i: np.std(results[i]["scores"]) for i in alive}
+                leader = max(alive, key=mean.get)
+                floor = mean[leader] - std[leader] - prune_margin
+                survivors = [i for i in alive if mean[i] + std[i] >= floor]
+            for i in set(alive) - set(survivors):
+                results[i]["pruned"] = True
+            print(f"  fold {fold + 1}/{folds}: {len(alive)} configs evaluated, {len(alive) - len(survivors)} pruned")
+            alive = survivors
+
+    summary = []
+    for r in results:
+        summary.append({
+            "params": r["params"],
+            "accuracy": float(np.mean(r["scores"])),
+            "accuracy_std": float(np.std(r["scores"])),
+            "folds": len(r["scores"]),
+            "fit_s": float(np.mean(r["fit_s"])),
+            "size_kb": float(np.mean(r["size"])) / 1024,
+            "latency_ms": float(np.mean(r["latency"])) * 1000,
+            "pruned": r["pruned"],
+        })
+    summary.sort(key=lambda r: (r["pruned"], -r["accuracy"]))
+    print(f"Search finished in {time.perf_counter() - start:.1f}s")
+    print_results(summary)
+    return summary
+
+def select_model(results, target_accuracy=None):
+    """
+    Fastest (lowest single-row latency) fully cross-validated config meeting
+    target_accuracy; the most accurate one if none does or no target is given.
+    """
+    finished = [r for r in results if not r["pruned"]]
+    if target_accuracy is not None:
+        passing = [r for r in finished if r["accuracy"] >= target_accuracy]
+        if passing:
+            return min(passing, key=lambda r: r["latency_ms"])
+        print(f"No config reached {target_accuracy:.3f} accuracy; using the most accurate.")
+    return max(finished, key=lambda r: r["accuracy"])
+
+def print_results(results):
+    print(f"{'acc':>7}{'std':>7}{'folds':>6}{'fit s':>8}{'size KB':>9}{'1-row ms':>10}  params")
+    for r in results:
+        flag = " (pruned)" if r["pruned"] else ""
+        print(f"{r['accuracy']:>7.3f}{r['accuracy_std']:>7.3f}{r['folds']:>6}{r['fit_s']:>8.2f}"
+              f"{r['size_kb']:>9.0f}{r['latency_ms']:>10.3f}  {r['params']}{flag}")
+
+if __name__ == "__main__":
+    select_model(search_models())
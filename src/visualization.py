@@ -1,36 +1,73 @@
+import itertools
+import time
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 import matplotlib.gridspec as gridspec
+from matplotlib.colors import to_rgba_array
 from mpl_toolkits.mplot3d import Axes3D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 import numpy as np
-from src.agents import Cell, NanoBot
+from src.config import VIS_FRAME_INTERVAL_MS, VIS_BLIT, PARTICLE_CAPACITY, SIM_DECOUPLED, SIM_TICK_RATE
+from src.particles import ParticlePool
+from src.runner import SimulationRunner, take_snapshot
+
+CELL_COLORS = to_rgba_array(['#002e12', '#fdf500', '#ff003c']) # Passive, repairing, cancer
+BOT_COLORS = to_rgba_array(['#0055ff', 'white', '#00f2ff']) # Idle, scanning, acting
+
+# Particle palette indices
+FLASH, SPARK = 0, 1
 
 class Visualization:
-    def __init__(self, model):
+    """
+    Desktop renderer. Every artist is created once in __init__ and updated in
+    place each frame (scatter offsets/colors/sizes, line data, one
+    Line3DCollection for all lasers). With blitting, the static figure is
+    drawn once and cached; frames restore that background and redraw only
+    the animated artists. A full redraw happens only when an analytics axis
+    has to rescale, so limits grow in steps rather than every frame.
+
+    By default the model steps once per frame. With decoupled=True it runs on
+    a SimulationRunner thread at tick_rate (None = as fast as possible) and
+    each frame draws the latest published snapshot, so slow frames are
+    dropped instead of slowing the simulation.
+
+    model may be None when only draw_snapshot is used (offline rendering,
+    see src/render.py); space_dims then sets the scene bounds.
+    """
+    def __init__(self, model, blit=VIS_BLIT, interval=VIS_FRAME_INTERVAL_MS, decoupled=SIM_DECOUPLED, tick_rate=SIM_TICK_RATE,
+                 space_dims=None):
         self.model = model
-        
+        self.interval = interval
+        self.runner = SimulationRunner(model, tick_rate) if decoupled else None
+        space_dims = space_dims or model.space_dims
+        self.rng = np.random # Effects randomness; the offline renderer seeds it per frame
+        self.show_rates = True
+
         # Setup Figure with GridSpec (Main 3D View + Side Analysis)
         self.fig = plt.figure(figsize=(16, 9))
         self.fig.canvas.manager.set_window_title("AI Diagnostics Nano-Bot Integration System | v2.0")
-        
+
         # Dark Sci-Fi Theme
         self.bg_color = '#02040a'  # Deep dark blue/black
         self.fig.patch.set_facecolor(self.bg_color)
-        
+
         # Grid Layout: 1 Row, 2 Columns (Sim :: Stats)
         gs = gridspec.GridSpec(2, 4, figure=self.fig)
-        
+
         # 3D Simulation View (Takes up left 3/4)
         self.ax_sim = self.fig.add_subplot(gs[:, :3], projection='3d')
         self.ax_sim.set_facecolor(self.bg_color)
-        
+        self.ax_sim.axis('off')
+        self.ax_sim.set_xlim(0, space_dims[0])
+        self.ax_sim.set_ylim(0, space_dims[1])
+        self.ax_sim.set_zlim(0, space_dims[2])
+
         # Connect Controls
         self.fig.canvas.mpl_connect('key_press_event', self.on_key)
-        
+
         # Analytics Views (Right 1/4)
         self.ax_stats1 = self.fig.add_subplot(gs[0, 3]) # Population Graph
         self.ax_stats2 = self.fig.add_subplot(gs[1, 3]) # Efficiency/Other
-        
+
         # Style Analytics Plots
         for ax in [self.ax_stats1, self.ax_stats2]:
             ax.set_facecolor(self.bg_color)
@@ -41,182 +78,231 @@ class Visualization:
             ax.spines['left'].set_color('cyan')
             ax.spines['right'].set_color('none')
             ax.grid(True, color='cyan', alpha=0.1)
+        self.ax_stats1.set_title("Cell Population", color='cyan', fontsize=10)
+        self.ax_stats2.set_title("Nano-Bot Activity", color='magenta', fontsize=10)
+        self.ax_stats2.grid(True, color='magenta', alpha=0.1)
+
+        # --- Persistent Artists ---
+        empty = ([], [], [])
+        self.cell_scatter = self.ax_sim.scatter(*empty, alpha=0.9, edgecolors='none', depthshade=True)
+        self.lasers = Line3DCollection([], colors='#00f2ff', linewidths=1.5, alpha=0.8)
+        self.ax_sim.add_collection3d(self.lasers, autolim=False)
+        self.bot_scatter = self.ax_sim.scatter(*empty, marker='^', s=80, alpha=1.0)
+        self.particle_scatter = self.ax_sim.scatter(*empty, alpha=0.8, marker='.')
+        self.hud = self.ax_sim.text2D(0.02, 0.95, "", transform=self.ax_sim.transAxes, color='#00f2ff', fontsize=12, family='monospace', va='top')
+
+        self.line_healthy, = self.ax_stats1.plot([], [], color='#00ff41', label='Healthy', linewidth=1.5) # Neon Green
+        self.line_cancer, = self.ax_stats1.plot([], [], color='#ff003c', label='Cancer', linewidth=1.5) # Neon Red
+        self.line_bots, = self.ax_stats2.plot([], [], color='magenta', label='Active Bots', linewidth=1.5)
+        self.ax_stats1.legend(loc='upper right', facecolor='black', edgecolor='cyan', labelcolor='white', fontsize=8)
+        self.ax_stats1.set_xlim(0, 200)
+        self.ax_stats2.set_xlim(0, 200)
+        self.ax_stats1.set_ylim(0, 10)
+        self.ax_stats2.set_ylim(0, 10)
+
+        self.animated = [self.cell_scatter, self.lasers, self.bot_scatter, self.particle_scatter, self.hud,
+                         self.line_healthy, self.line_cancer, self.line_bots]
+
+        # Blitting needs backend support (Agg-based canvases have it)
+        self.blit = blit and self.fig.canvas.supports_blit
+        for artist in self.animated:
+            artist.set_animated(self.blit)
+        self._background = None
+        self._needs_redraw = True
+        if self.blit:
+            self.fig.canvas.mpl_connect('draw_event', self.on_draw)
 
         # Data History
         self.history_healthy = []
         self.history_cancer = []
         self.history_bots_active = []
         self.frames = []
-        
+
         # Particle System
-        self.particles = [] # List of dicts: {'pos': (x,y,z), 'life': 10, 'color': 'color', 'vel': (dx,dy,dz)}
-        
+        self.particles = ParticlePool(PARTICLE_CAPACITY, palette=('#00ff41', '#fdf500')) # Green flash, yellow spark
+
+        # Render rate (exponential moving average of frame intervals)
+        self.fps = 0.0
+        self._last_frame = None
+
     def on_key(self, event):
         if event.key == 'c':
-            self.model.add_cancer()
+            self._command(self.model.add_cancer)
             print("Injecting Cancer Cell...")
         elif event.key == 'b':
-            self.model.add_bot()
+            self._command(self.model.add_bot)
             print("Deploying Nano-Bot...")
-            
+
+    def _command(self, fn):
+        # The model belongs to the sim thread when decoupled
+        if self.runner is not None:
+            self.runner.call(fn)
+        else:
+            fn()
+
     def init_plot(self):
-        return []
+        return self.animated
+
+    def on_draw(self, event):
+        # A full draw (first show, resize, rescale) renders everything but the
+        # animated artists: cache it as the blit background, then draw them on top.
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        # Outside Axes3D.draw the projection must be refreshed by hand
+        self.ax_sim.M = self.ax_sim.get_proj()
+        self.ax_sim.invM = np.linalg.inv(self.ax_sim.M)
+        for artist in self.animated:
+            if hasattr(artist, 'do_3d_projection'):
+                artist.do_3d_projection()
+            artist.axes.draw_artist(artist)
+
+    def _tick_fps(self):
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            dt = max(now - self._last_frame, 1e-6)
+            self.fps = 1.0 / dt if not self.fps else 0.9 * self.fps + 0.1 / dt
+        self._last_frame = now
+
+    def _rescale(self, ax, frame, ymax, window):
+        """
+        Moves limits in steps so the blit background rarely goes stale.
+        Limits depend only on the visible window (not on earlier frames), so
+        offline shards render the same axes as a sequential run. Returns True if changed.
+        """
+        x0 = (max(0, frame - window) // window) * window
+        xlim = (x0, x0 + 2 * window)
+        top = 10
+        while top <= ymax:
+            top *= 2
+        if ax.get_xlim() == xlim and ax.get_ylim()[1] == top:
+            return False
+        ax.set_xlim(*xlim)
+        ax.set_ylim(0, top)
+        return True
 
     def update(self, frame):
-        self.model.step()
-        
+        if self.runner is None:
+            # Lockstep: one tick per rendered frame
+            self.model.step()
+            snap = take_snapshot(self.model, frame + 1)
+            explosions = snap.neutralized
+        else:
+            # Decoupled: draw whatever the sim thread published last
+            snap = self.runner.latest
+            explosions = self.runner.drain_events()
+        self._tick_fps()
+        return self.draw_snapshot(snap, frame, explosions)
+
+    def draw_snapshot(self, snap, frame, explosions):
         # --- 3D Simulation Update ---
-        self.ax_sim.clear()
-        self.ax_sim.set_facecolor(self.bg_color)
-        self.ax_sim.axis('off')
-        
         # Dynamic Camera (Slow Rotation)
         self.ax_sim.view_init(elev=25, azim=frame * 0.2)
-        self.ax_sim.set_xlim(0, self.model.space_dims[0])
-        self.ax_sim.set_ylim(0, self.model.space_dims[1])
-        self.ax_sim.set_zlim(0, self.model.space_dims[2])
-
-        # Collect Data
-        cells = [a for a in self.model.agents_list if isinstance(a, Cell)]
-        bots = [a for a in self.model.agents_list if isinstance(a, NanoBot)]
-        
+
         # --- Analytics Data Update ---
-        healthy_count = len([c for c in cells if not c.is_cancer])
-        cancer_count = len([c for c in cells if c.is_cancer])
-        active_bots = len([b for b in bots if b.state != "IDLE"])
-        
-        self.frames.append(frame)
-        self.history_healthy.append(healthy_count)
-        self.history_cancer.append(cancer_count)
-        self.history_bots_active.append(active_bots)
-        
-        # Keep graph window moving (last 100 frames)
+        healthy_count = snap.healthy_count
+        cancer_count = snap.cancer_count
+        active_bots = snap.active_bots
+        n_bots = len(snap.bot_state)
+
+        if not self.frames or self.frames[-1] != snap.tick:
+            self.frames.append(snap.tick)
+            self.history_healthy.append(healthy_count)
+            self.history_cancer.append(cancer_count)
+            self.history_bots_active.append(active_bots)
+
+        # Keep graph window moving (last 100 ticks)
         window = 100
-        if len(self.frames) > window:
-            plot_frames = self.frames[-window:]
-            plot_healthy = self.history_healthy[-window:]
-            plot_cancer = self.history_cancer[-window:]
-            plot_bots = self.history_bots_active[-window:]
-        else:
-            plot_frames = self.frames
-            plot_healthy = self.history_healthy
-            plot_cancer = self.history_cancer
-            plot_bots = self.history_bots_active
+        plot_frames = self.frames[-window:]
+        plot_healthy = self.history_healthy[-window:]
+        plot_cancer = self.history_cancer[-window:]
+        plot_bots = self.history_bots_active[-window:]
 
         # --- Draw Analytics ---
-        self.ax_stats1.clear()
-        self.ax_stats1.set_title("Cell Population", color='cyan', fontsize=10)
-        self.ax_stats1.plot(plot_frames, plot_healthy, color='#00ff41', label='Healthy', linewidth=1.5) # Neon Green
-        self.ax_stats1.plot(plot_frames, plot_cancer, color='#ff003c', label='Cancer', linewidth=1.5) # Neon Red
-        self.ax_stats1.legend(loc='upper right', facecolor='black', edgecolor='cyan', labelcolor='white', fontsize=8)
-        self.ax_stats1.set_facecolor(self.bg_color)
-        self.ax_stats1.grid(color='cyan', alpha=0.1)
-
-        self.ax_stats2.clear()
-        self.ax_stats2.set_title("Nano-Bot Activity", color='magenta', fontsize=10)
-        self.ax_stats2.plot(plot_frames, plot_bots, color='magenta', label='Active Bots', linewidth=1.5)
-        self.ax_stats2.set_facecolor(self.bg_color)
-        self.ax_stats2.grid(color='magenta', alpha=0.1)
-        self.ax_stats2.set_ylim(0, len(bots) + 1)
+        self.line_healthy.set_data(plot_frames, plot_healthy)
+        self.line_cancer.set_data(plot_frames, plot_cancer)
+        self.line_bots.set_data(plot_frames, plot_bots)
+        if self._rescale(self.ax_stats1, snap.tick, max(max(plot_healthy), max(plot_cancer)), window):
+            self._needs_redraw = True
+        if self._rescale(self.ax_stats2, snap.tick, n_bots, window):
+            self._needs_redraw = True
 
         # --- Draw Agents (3D) ---
-        # Cells
-        c_x, c_y, c_z, c_c, c_s = [], [], [], [], []
-        for c in cells:
-            c_x.append(c.pos[0])
-            c_y.append(c.pos[1])
-            c_z.append(c.pos[2])
-            
-            # Check for events
-            if c.just_neutralized:
-                # Spawn Explosion Particles
-                for _ in range(10): # 10 particles per explosion
-                    self.particles.append({
-                        'pos': c.pos,
-                        'life': 15,
-                        'color': '#00ff41', # Green flash
-                        'vel': np.random.uniform(-1, 1, 3) 
-                    })
-                c.just_neutralized = False
-            
-            if c.is_cancer:
-                # Pulse effect for cancer
-                pulse = (np.sin(frame * 0.2) + 1.5) * 0.5 
-                c_s.append(150 * pulse)
-                c_c.append('#ff003c') # Neon Red
-            elif c.being_repaired:
-                c_s.append(120)
-                c_c.append('#fdf500') # Neon Yellow
-                # Spawn repair sparks occasionally
-                if np.random.random() < 0.3:
-                     self.particles.append({
-                        'pos': c.pos,
-                        'life': 5,
-                        'color': '#fdf500', 
-                        'vel': np.random.uniform(-0.5, 0.5, 3) 
-                    })
-            else:
-                c_s.append(50)
-                c_c.append('#002e12') # Dark Green (Passive)
-        
-        self.ax_sim.scatter(c_x, c_y, c_z, c=c_c, s=c_s, alpha=0.9, edgecolors='none', depthshade=True)
-
-        # Bots
-        b_x, b_y, b_z, b_c = [], [], [], []
-        for b in bots:
-            b_x.append(b.pos[0])
-            b_y.append(b.pos[1])
-            b_z.append(b.pos[2])
-            
-            if b.state == 'SCANNING':
-                b_c.append('white') # Scanning
-            elif b.state == 'ACTING':
-                b_c.append('#00f2ff') # Cyan Action
-            else:
-                 b_c.append('#0055ff') # Blue Idle
-
-            # Targeting Lasers
-            if b.state != "IDLE" and b.target_cell:
-                tx, ty, tz = b.target_cell.pos
-                self.ax_sim.plot([b.pos[0], tx], [b.pos[1], ty], [b.pos[2], tz], color='#00f2ff', linewidth=1.5, alpha=0.8)
-
-        self.ax_sim.scatter(b_x, b_y, b_z, c=b_c, marker='^', s=80, alpha=1.0)
-        
+        # Cells: passive (dark green), being repaired (neon yellow) or cancer (neon red, pulsing)
+        pulse = (np.sin(frame * 0.2) + 1.5) * 0.5
+        kind = np.where(snap.cell_cancer, 2, np.where(snap.cell_repairing, 1, 0))
+        self._set_points(self.cell_scatter, snap.cell_pos, CELL_COLORS[kind], np.array([50, 120, 150 * pulse])[kind])
+
+        # Bots: blue idle, white scanning, cyan acting; plus targeting lasers
+        state = np.where(snap.bot_state == 'SCANNING', 1, np.where(snap.bot_state == 'ACTING', 2, 0))
+        self._set_points(self.bot_scatter, snap.bot_pos, BOT_COLORS[state])
+        self.lasers.set_segments(snap.lasers)
+
         # --- Update and Draw Particles ---
-        p_x, p_y, p_z, p_c, p_s = [], [], [], [], []
-        for p in self.particles[:]:
-            p['life'] -= 1
-            if p['life'] <= 0:
-                self.particles.remove(p)
-                continue
-            
-            # Move particle
-            x, y, z = p['pos']
-            vx, vy, vz = p['vel']
-            p['pos'] = (x+vx, y+vy, z+vz)
-            
-            p_x.append(p['pos'][0])
-            p_y.append(p['pos'][1])
-            p_z.append(p['pos'][2])
-            p_c.append(p['color'])
-            p_s.append(p['life'] * 5) # Fade out size
-            
-        if p_x:
-            self.ax_sim.scatter(p_x, p_y, p_z, c=p_c, s=p_s, alpha=0.8, marker='.')
+        # Spawn Explosion Particles (10 per neutralization)
+        self.particles.emit(explosions, 10, life=15, color=FLASH, speed=1.0, rng=self.rng)
+        # Spawn repair sparks occasionally
+        repairs = snap.cell_pos[snap.cell_repairing & ~snap.cell_cancer]
+        sparks = repairs[self.rng.random(len(repairs)) < 0.3]
+        self.particles.emit(sparks, 1, life=5, color=SPARK, speed=0.5, rng=self.rng)
+        self.particles.step()
+        self._set_points(self.particle_scatter, self.particles.positions(), self.particles.colors(), self.particles.sizes())
 
         # --- HUD Text ---
-        hud_text = (
+        if self.show_rates:
+            tick_rate = self.runner.tick_rate_achieved if self.runner is not None else self.fps
+            rates = (f"SIM: {tick_rate:6.1f} TICKS/S (TICK {snap.tick})\n"
+                     f"RENDER: {self.fps:5.1f} FPS ({'BLIT' if self.blit else 'FULL'})\n")
+        else:
+            rates = f"TICK: {snap.tick}\n"
+        self.hud.set_text(
             f"SYSTEM STATUS: ONLINE\n"
             f"THREAT LEVEL: {'CRITICAL' if cancer_count > 5 else 'STABLE'}\n"
             f"---------------------\n"
             f"HEALTH INTEGRITY: {int((healthy_count / (healthy_count + cancer_count + 1)) * 100)}%\n"
-            f"BOT EFFICIENCY: {int((active_bots / (len(bots)+0.1)) * 100)}%\n"
+            f"BOT EFFICIENCY: {int((active_bots / (n_bots+0.1)) * 100)}%\n"
+            f"{rates}"
             f"\nCONTROLS:\n"
             f"[C] INJECT CANCER\n"
             f"[B] DEPLOY BOT"
         )
-        self.ax_sim.text2D(0.02, 0.95, hud_text, transform=self.ax_sim.transAxes, color='#00f2ff', fontsize=12, family='monospace')
+        return self.animated
+
+    def _set_points(self, scatter, xyz, colors, sizes=None):
+        """Updates a 3D scatter in place."""
+        xyz = np.asarray(xyz, dtype=float).reshape(-1, 3)
+        scatter._offsets3d = (xyz[:, 0], xyz[:, 1], xyz[:, 2])
+        scatter.set_facecolor(colors if len(xyz) else 'none')
+        if sizes is not None:
+            scatter.set_sizes(np.asarray(sizes, dtype=float))
+
+    def render_frame(self, frame):
+        """Advances one frame and updates the canvas (blitted when possible)."""
+        self.update(frame)
+        canvas = self.fig.canvas
+        if not self.blit:
+            canvas.draw_idle()
+            return
+        if self._needs_redraw or self._background is None:
+            # Static content changed: full draw, which re-caches the background via on_draw
+            self._needs_redraw = False
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            self.draw_animated()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
 
     def show(self):
-        ani = animation.FuncAnimation(self.fig, self.update, init_func=self.init_plot, frames=1000, interval=50)
+        # FuncAnimation's own blitting re-caches the background whenever an
+        # Axes' view changes, which the rotating camera does every frame, so
+        # frames are driven by a plain timer and blitted here instead.
+        frames = itertools.count()
+        self.timer = self.fig.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(lambda: self.render_frame(next(frames)))
+        if self.runner is not None:
+            self.runner.start()
+            self.fig.canvas.mpl_connect('close_event', lambda event: self.runner.stop())
+        self.timer.start()
         plt.show()
@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("diagnose_queue_depth", "Images waiting in the /diagnose micro-batch queue")
+BATCH_SIZE = REGISTRY.histogram("diagnose_batch_size", "Images per /diagnose inference batch",
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_SECONDS = REGISTRY.histogram("diagnose_batch_seconds", "Inference time per /diagnose batch")
+
+class MicroBatcher:
+    """
+    Async micro-batching queue in front of a batch predict function.
+    Requests are gathered for up to max_wait_ms or max_batch images, then
+    scored with one predict_fn call on a worker thread, so the event loop
+    never blocks and concurrent callers share a single inference.
+    """
+    def __init__(self, predict_fn, max_batch=64, max_wait_ms=5, workers=1):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="diagnose")
+        self._slots = None
+        self._queue = None
+        self._task = None
+        self._inflight = set() # Strong refs so dispatch tasks aren't garbage collected
+        self._depth = 0
+
+    def start(self):
+        if self._task is None:
+            # Created here so they bind to the running event loop
+            self._slots = asyncio.Semaphore(self.workers)
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, images):
+        """images: preprocessed (k, H, W, 3) array. Returns k scores."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._depth += len(images)
+        QUEUE_DEPTH.set(self._depth)
+        self._queue.put_nowait((images, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            n = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                n += len(item[0])
+
+            self._depth -= n
+            QUEUE_DEPTH.set(self._depth)
+            # Bound in-flight batches to the worker count; keep collecting meanwhile
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, items):
+        loop = asyncio.get_running_loop()
+        try:
+            batch = np.concatenate([images for images, _ in items])
+            BATCH_SIZE.observe(len(batch))
+            start = loop.time()
+            scores = await loop.run_in_executor(self.executor, self.predict_fn, batch)
+            BATCH_SECONDS.observe(loop.time() - start)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        offset = 0
+        for images, future in items:
+            if not future.done(): # Caller may have disconnected
+                future.set_result(scores[offset:offset + len(images)])
+            offset += len(images)
@@ -1,16 +1,24 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
 import asyncio
 import sys
 import os
+import time
 
 # Add parent dir to path to import src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.environment import Bloodstream
 from src.environment import Bloodstream
-from src.agents import Cell, NanoBot, RechargeStation
+from src.agents import Cell, NanoBot
 from src.database import DatabaseManager
+from src.metrics import REGISTRY
+from src.config import DIAGNOSIS_MODE, DIAGNOSIS_THRESHOLD, DIAGNOSE_MAX_BATCH, DIAGNOSE_MAX_WAIT_MS, DIAGNOSE_WORKERS
+from src.web.batching import MicroBatcher
 
 db_manager = DatabaseManager()
 
@@ -29,33 +37,96 @@ simulation = None
 running = False
 SIM_SPEED = 0.1 # Default delay in seconds
 
+# Instrumentation
+HTTP_SECONDS = REGISTRY.histogram("http_request_seconds", "FastAPI handler latency", labelnames=("method", "path"))
+TICK_INTERVAL_SECONDS = REGISTRY.histogram("sim_tick_interval_seconds", "Time between consecutive simulation ticks in the server loop")
+TICKS_PER_SECOND = REGISTRY.gauge("sim_ticks_per_second", "Tick rate of the server loop", labelnames=("kind",))
+SIM_RUNNING = REGISTRY.gauge("sim_running", "1 while the server loop is stepping the simulation")
+AGENTS = REGISTRY.gauge("sim_agents", "Agents in the simulation", labelnames=("type",))
+CELLS = REGISTRY.gauge("sim_cells", "Cells by status", labelnames=("status",))
+ACTIVE_BOTS = REGISTRY.gauge("sim_active_bots", "NanoBots not in IDLE state")
+BOTS_BY_STATE = REGISTRY.gauge("sim_bots", "NanoBots by state", labelnames=("state",))
+EVENT_LOOP_TASKS = REGISTRY.gauge("server_event_loop_tasks", "Pending asyncio tasks on the server event loop")
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (e.g. /control/bot/{bot_id}/command) to keep cardinality bounded
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, path=path)
+    return response
+
 def get_sim():
     global simulation
     if simulation is None:
         simulation = Bloodstream()
     return simulation
 
+# Diagnosis Service (classifier loads lazily on the first batch, off the event loop)
+classifier = None
+batcher = None
+
+def get_classifier():
+    global classifier
+    if classifier is None:
+        from src.model import CellClassifier
+        classifier = CellClassifier()
+    return classifier
+
+def get_batcher():
+    global batcher
+    if batcher is None:
+        clf = get_classifier()
+        # Batches are small, so skip joblib dispatch inside the forest
+        batcher = MicroBatcher(lambda images: clf.predict_batch(images, n_jobs=1),
+                               max_batch=DIAGNOSE_MAX_BATCH, max_wait_ms=DIAGNOSE_MAX_WAIT_MS,
+                               workers=DIAGNOSE_WORKERS)
+    return batcher
+
+def decode_uploads(payloads):
+    import cv2
+    import numpy as np
+    from src.model import preprocess_image
+    images = []
+    for data in payloads:
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        images.append(preprocess_image(img))
+    return np.stack(images)
+
 async def run_simulation():
     global running, simulation, SIM_SPEED
+    last_tick = None
     while True:
         if running and simulation:
+            now = time.perf_counter()
+            if last_tick is not None:
+                interval = now - last_tick
+                TICK_INTERVAL_SECONDS.observe(interval)
+                TICKS_PER_SECOND.set(1.0 / interval, kind="achieved")
+            last_tick = now
             simulation.step()
             await asyncio.sleep(SIM_SPEED) # Control speed
         else:
+            last_tick = None
             await asyncio.sleep(0.5)
 
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(run_simulation())
+    get_batcher().start()
 
 @app.get("/status")
 def get_status():
     sim = get_sim()
     cells = [a for a in sim.agents_list if isinstance(a, Cell)]
     bots = [a for a in sim.agents_list if isinstance(a, NanoBot)]
-    stations = [a for a in sim.agents_list if isinstance(a, RechargeStation)]
+    stations = sim.stations
     
-    healthy = len([c for c in cells if not c.is_cancer])
+    healthy = len([c for c in cells if not c.is_cancer]) + sim.archived_healthy
     cancer = len([c for c in cells if c.is_cancer])
     bots_active = len([b for b in bots if b.state != "IDLE"])
     
@@ -92,14 +163,15 @@ def get_status():
             "id": c.unique_id,
             "type": "cell",
             "pos": c.pos,
-            "status": status
+            "status": status,
+            "diagnosis": c.diagnosis
         })
 
     return {
         "running": running,
         "healthy": healthy,
         "cancer": cancer,
-        "total_cells": len(cells),
+        "total_cells": len(cells) + sim.archived_healthy,
         "active_bots": bots_active,
         "total_bots": len(bots),
         "efficiency": int((bots_active / (len(bots)+1)) * 100) if len(bots) > 0 else 0,
@@ -107,6 +179,60 @@ def get_status():
         "dims": sim.space_dims
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of tick, phase and handler timings."""
+    # Gauges are refreshed at scrape time so the tick loop pays nothing for them
+    SIM_RUNNING.set(1 if running else 0)
+    TICKS_PER_SECOND.set(1.0 / SIM_SPEED, kind="requested")
+    EVENT_LOOP_TASKS.set(len(asyncio.all_tasks()))
+    if simulation is not None:
+        counts = {"Cell": 0, "NanoBot": 0, "RechargeStation": 0}
+        cells = {"healthy": 0, "cancer": 0, "repair": 0}
+        bot_states = {}
+        for a in simulation.agents_list:
+            kind = a.__class__.__name__
+            counts[kind] = counts.get(kind, 0) + 1
+            if isinstance(a, Cell):
+                if a.is_cancer: cells["cancer"] += 1
+                elif a.being_repaired: cells["repair"] += 1
+                else: cells["healthy"] += 1
+            elif isinstance(a, NanoBot):
+                bot_states[a.state] = bot_states.get(a.state, 0) + 1
+        for kind, n in counts.items():
+            AGENTS.set(n, type=kind)
+        cells["healthy"] += simulation.archived_healthy
+        for status, n in cells.items():
+            CELLS.set(n, status=status)
+        for state in ("IDLE", "TARGETING", "SCANNING", "ACTING", "LOW_BATTERY", "RECHARGING"):
+            bot_states.setdefault(state, 0)
+        for state, n in bot_states.items():
+            BOTS_BY_STATE.set(n, state=state)
+        ACTIVE_BOTS.set(counts["NanoBot"] - bot_states["IDLE"])
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/diagnose")
+async def diagnose(files: List[UploadFile] = File(...)):
+    """
+    Classifies one or more uploaded images. Concurrent requests are
+    micro-batched into a single inference call.
+    """
+    payloads = [await f.read() for f in files]
+    images = await run_in_threadpool(decode_uploads, payloads)
+    if images is None:
+        return {"status": "error", "message": "Could not decode image"}
+
+    scores = await get_batcher().submit(images)
+    results = []
+    for f, p in zip(files, scores):
+        p = float(p)
+        results.append({
+            "filename": f.filename,
+            "p_cancer": p,
+            "diagnosis": "cancer" if p >= DIAGNOSIS_THRESHOLD else "healthy"
+        })
+    return {"status": "success", "results": results}
+
 @app.post("/control/start")
 def start_sim():
     global running
@@ -121,13 +247,17 @@ def stop_sim():
     return {"status": "stopped"}
 
 @app.post("/control/reset")
-def reset_sim():
+def reset_sim(diagnosis: bool = DIAGNOSIS_MODE):
     global simulation, running
+    try:
+        fresh = Bloodstream(diagnosis=diagnosis)
+    except RuntimeError as e:
+        return {"status": "error", "message": str(e)}
     running = False
     if simulation:
         simulation.collector.stop_collection()
-    simulation = Bloodstream()
-    return {"status": "reset"}
+    simulation = fresh
+    return {"status": "reset", "diagnosis": diagnosis}
 
 @app.get("/api/history/runs")
 def get_runs():
@@ -155,25 +285,78 @@ def update_config(speed: float):
     SIM_SPEED = max(0.01, min(2.0, speed)) # Clamp speed
     return {"status": "updated", "speed": SIM_SPEED}
 
+def recall_bot(bot):
+    bot.state = "LOW_BATTERY"
+    bot.manual_override = True
+
+def release_bot(bot):
+    bot.manual_override = False
+    bot.state = "IDLE"
+
+BOT_COMMANDS = {
+    "RECALL": (recall_bot, "Bot recalled to base"),
+    "RELEASE": (release_bot, "Bot returned to autonomous mode"),
+}
+
 @app.post("/control/bot/{bot_id}/command")
 def packet_command(bot_id: int, command: str):
     sim = get_sim()
-    bot = next((a for a in sim.agents_list if isinstance(a, NanoBot) and a.unique_id == bot_id), None)
+    bot = sim.get_agent(bot_id)
     
-    if not bot:
+    if not isinstance(bot, NanoBot):
         return {"status": "error", "message": "Bot not found"}
     
-    if command == "RECALL":
-        bot.state = "LOW_BATTERY"
-        bot.manual_override = True
-        return {"status": "success", "message": "Bot recalled to base"}
-    
-    if command == "RELEASE":
-        bot.manual_override = False
-        bot.state = "IDLE"
-        return {"status": "success", "message": "Bot returned to autonomous mode"}
+    if command not in BOT_COMMANDS:
+        return {"status": "error", "message": "Unknown command"}
+
+    action, message = BOT_COMMANDS[command]
+    action(bot)
+    return {"status": "success", "message": message}
+
+class Region(BaseModel):
+    min: Tuple[float, float, float]
+    max: Tuple[float, float, float]
+
+class FleetCommand(BaseModel):
+    command: str
+    ids: Optional[List[int]] = None
+    region: Optional[Region] = None
+    states: Optional[List[str]] = None
+    battery_below: Optional[float] = None
+    battery_above: Optional[float] = None
+
+@app.post("/control/bots/command")
+def fleet_command(req: FleetCommand):
+    """
+    Applies one command to every bot matching all given selectors,
+    e.g. {"command": "RECALL", "battery_below": 40}.
+    """
+    if req.command not in BOT_COMMANDS:
+        return {"status": "error", "message": "Unknown command"}
 
-    return {"status": "error", "message": "Unknown command"}
+    selectors = [req.ids, req.region, req.states, req.battery_below, req.battery_above]
+    if all(s is None for s in selectors):
+        return {"status": "error", "message": "No selector given (ids, region, states, battery_below, battery_above)"}
+
+    sim = get_sim()
+    bots = sim.select_bots(
+        ids=req.ids,
+        region=(req.region.min, req.region.max) if req.region else None,
+        states=req.states,
+        battery_below=req.battery_below,
+        battery_above=req.battery_above,
+    )
+
+    action, message = BOT_COMMANDS[req.command]
+    for bot in bots:
+        action(bot)
+
+    return {
+        "status": "success",
+        "message": message,
+        "matched": len(bots),
+        "ids": [b.unique_id for b in bots],
+    }
 
 if __name__ == "__main__":
     import uvicorn
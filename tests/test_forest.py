@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+joblib = pytest.importorskip("joblib")
+from sklearn.ensemble import RandomForestClassifier
+
+from src.forest import CompiledForest
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 12))
+    y = np.where(X[:, 0] + 0.5 * X[:, 3] - X[:, 7] ** 2 > 0, "cancer", "healthy")
+    clf = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X[:300], y[:300])
+    return clf, X
+
+def test_predict_proba_matches_sklearn(fitted):
+    clf, X = fitted
+    forest = CompiledForest.from_sklearn(clf)
+    np.testing.assert_allclose(forest.predict_proba(X), clf.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), clf.predict(X))
+    np.testing.assert_array_equal(forest.classes_, clf.classes_)
+
+def test_single_row_matches_sklearn(fitted):
+    clf, X = fitted
+    forest = CompiledForest.from_sklearn(clf)
+    np.testing.assert_allclose(forest.predict_proba(X[:1]), clf.predict_proba(X[:1]), rtol=0, atol=1e-12)
+
+def test_parity_after_memmapped_round_trip(fitted, tmp_path):
+    clf, X = fitted
+    path = tmp_path / "forest.joblib"
+    joblib.dump({"model": CompiledForest.from_sklearn(clf)}, path)
+
+    forest = joblib.load(path, mmap_mode="r")["model"]
+    assert isinstance(forest.children, np.memmap)
+    np.testing.assert_allclose(forest.predict_proba(X), clf.predict_proba(X), rtol=0, atol=1e-12)
+
+def test_check_parity_rejects_mismatch(fitted):
+    clf, X = fitted
+    forest = CompiledForest.from_sklearn(clf)
+    forest.value = forest.value[:, ::-1].copy()
+    with pytest.raises(RuntimeError):
+        forest.check_parity(clf, X)
+
+def test_parity_through_saved_artifact(fitted, tmp_path):
+    pytest.importorskip("cv2")
+    from src.model import CellClassifier, save_model
+
+    clf, X = fitted
+    path = str(tmp_path / "model.joblib")
+    save_model(clf, features=None, path=path, check_X=X)
+
+    classifier = CellClassifier(path=path, mmap_mode="r", lazy=False)
+    assert isinstance(classifier.model, CompiledForest)
+    np.testing.assert_allclose(classifier.model.predict_proba(X), clf.predict_proba(X), rtol=0, atol=1e-12)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("cv2")
+from sklearn.ensemble import RandomForestClassifier
+
+from src.model import grow_trees, holdout_split, update_seed
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, 6))
+    return X, np.where(X[:, 0] > 0, "cancer", "healthy")
+
+def test_updates_grow_trees_with_fresh_seeds():
+    X, y = _data()
+    clf = RandomForestClassifier(n_estimators=10, random_state=42).fit(X, y)
+    seen = {est.random_state for est in clf.estimators_}
+    for updates in (1, 2, 3):
+        grow_trees(clf, X, y, 5, update_seed(updates), replace_oldest=True)
+        new = {est.random_state for est in clf.estimators_[-5:]}
+        assert len(clf.estimators_) == 10
+        assert not new & seen
+        seen |= new
+
+def test_holdout_split_keeps_files_in_their_split():
+    entries = [{"path": f"img_{i}.png"} for i in range(50)]
+    train, test = holdout_split(entries)
+    manifest = {e["path"]: None for e in entries}
+    holdout = [entries[i]["path"] for i in test]
+
+    grown = entries[:25] + [{"path": f"new_{i}.png"} for i in range(20)] + entries[25:]
+    train2, test2 = holdout_split(grown, manifest, holdout)
+    test_paths = {grown[i]["path"] for i in test2}
+    assert set(holdout) <= test_paths
+    assert not test_paths & {entries[i]["path"] for i in train}
+    assert len(train2) + len(test2) == len(grown)
+
+def _image_batches(sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        labels = np.where(np.arange(n) % 2 == 0, "cancer", "healthy")
+        images = rng.integers(0, 256, size=(n, 8, 8, 3), dtype=np.uint8)
+        images[labels == "cancer", :, :, 0] = 255
+        yield images, labels
+
+def test_streaming_reservoir_keeps_distinct_seeds(tmp_path):
+    from src.model import train_model_streaming
+
+    clf, _ = train_model_streaming(_image_batches([32] * 30 + [1]), feature_pipeline="raw", trees_per_batch=4,
+                                   max_trees=20, min_batch_size=16, path=str(tmp_path / "m.joblib"))
+    seeds = [est.random_state for est in clf.estimators_]
+    assert len(seeds) == 20
+    assert len(set(seeds)) == len(seeds)